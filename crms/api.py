@@ -0,0 +1,377 @@
+"""JSON API for clients authenticated by ``Authorization: Bearer <api token>``.
+
+Requests are authenticated by a single indexed lookup of the token, without
+the cookie session and Flask-Login. Requests without the header, such as the
+ones of the service worker, fall back to the session of a logged in user.
+"""
+import datetime
+from typing import Optional
+
+import click
+from flask import Blueprint, Response, g, jsonify, request, url_for
+from flask.cli import with_appcontext
+from flask_login import current_user
+from sqlalchemy import Select, and_, or_, select
+from werkzeug.datastructures import MultiDict
+from werkzeug.wrappers import Response as BaseResponse
+
+from crms import days, export_jobs
+from crms.forms import DayForm
+from crms.models import Day, ExportJob, User, db
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# days returned by GET /days when no range is given
+DEFAULT_RANGE = datetime.timedelta(days=31)
+# days accepted by one POST /days or /sync
+MAX_BULK_DAYS = 1000
+# days returned by one GET /sync
+SYNC_PAGE_SIZE = 500
+
+
+def error(status: int, message: str, **kwargs: object) -> Response:
+    response = jsonify(error=message, **kwargs)
+    response.status_code = status
+    return response
+
+
+def parse_date(value: str) -> Optional[datetime.date]:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@api.before_request
+def authenticate() -> Optional[Response]:
+    if request.endpoint == "api.token":
+        return None
+
+    if "Authorization" not in request.headers and current_user.is_authenticated:
+        g.user_id = current_user.id
+        return None
+
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    user_id = None
+    if scheme.lower() == "bearer" and credentials:
+        user_id = db.session.scalar(User.select_by_api_token(credentials))
+    if user_id is None:
+        response = error(401, "Invalid or missing API token")
+        response.headers["WWW-Authenticate"] = "Bearer"
+        return response
+    g.user_id = user_id
+    return None
+
+
+@api.route("/token", methods=["POST"])
+def token() -> Response:
+    """Issue a new API token in exchange for the user's name and password.
+
+    The previous token of the user stops working.
+    """
+    payload = request.get_json(silent=True) or {}
+    user = db.session.scalar(User.select_by_name(payload.get("username")))
+    if not user or not user.verify_password(payload.get("password", "")):
+        return error(401, "Invalid username or password")
+    api_token = user.issue_api_token()
+    db.session.commit()
+    return jsonify(token=api_token)
+
+
+@api.route("/days", methods=["GET"])
+def list_days() -> Response:
+    """Return days between ``from`` and ``to``, the last month by default."""
+    end = parse_date(request.args.get("to", datetime.date.today().isoformat()))
+    if end is None:
+        return error(400, "Dates must be in YYYY-MM-DD format")
+    start = parse_date(request.args.get("from", (end - DEFAULT_RANGE).isoformat()))
+    if start is None:
+        return error(400, "Dates must be in YYYY-MM-DD format")
+
+    query = days.select_range(g.user_id, start, end)
+    return jsonify(days=[day.to_dict() for day in db.session.scalars(query).all()])
+
+
+def bulk_days() -> tuple[list[dict], Optional[Response]]:
+    """Take the list of days from the JSON body of the request.
+
+    Returns the days, or an error response when the body is not such a list.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get("days") if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+        return [], error(400, "Body must be a JSON object with a list of days")
+    if len(items) > MAX_BULK_DAYS:
+        return [], error(400, f"At most {MAX_BULK_DAYS} days can be saved at once")
+    return items, None
+
+
+def validate_day(item: dict, defaults: dict) -> tuple[dict, Optional[dict]]:
+    """Validate one day of a bulk request.
+
+    Returns its form data, or the error to report for it. Fields missing in
+    the day take their values from ``defaults``.
+    """
+    parsed = parse_date(str(item.get("date")))
+    if parsed is None:
+        return {}, {"error": "Dates must be in YYYY-MM-DD format"}
+    form = DayForm(MultiDict({**defaults, **item}))
+    if not form.validate():
+        return {}, {"error": "Invalid day", "fields": form.errors}
+    return {**form.data, "date": parsed}, None
+
+
+def validate_days() -> tuple[list[tuple[dict, dict]], Optional[Response]]:
+    """Validate the list of days in the JSON body of the request.
+
+    Returns each day paired with its form data, or an error response for the
+    first invalid day. Fields missing in a day take their default values.
+    """
+    items, response = bulk_days()
+    if response:
+        return [], response
+    defaults = Day.default(g.user_id, None).to_dict()
+    validated = []
+    for index, item in enumerate(items):
+        data, problem = validate_day(item, defaults)
+        if problem is not None:
+            message = problem.pop("error")
+            return [], error(400, message, index=index, **problem)
+        validated.append((item, data))
+    return validated, None
+
+
+@api.route("/days", methods=["POST"])
+def post_days() -> Response:
+    """Create or update many days at once.
+
+    The body is ``{"days": [{"date": "YYYY-MM-DD", ...}, ...]}``. Either all
+    days are saved, or none when any of them is invalid.
+    """
+    validated, response = validate_days()
+    if response:
+        return response
+    days.save_many(g.user_id, [data for _, data in validated])
+    return jsonify(saved=len(validated))
+
+
+@api.route("/days/<day_date>", methods=["GET"])
+def get_day(day_date: str) -> Response:
+    parsed = parse_date(day_date)
+    if parsed is None:
+        return error(400, "Dates must be in YYYY-MM-DD format")
+    return jsonify(days.get(g.user_id, parsed).to_dict())
+
+
+@api.route("/days/<day_date>", methods=["PUT"])
+def put_day(day_date: str) -> Response:
+    """Create or update a day, fields missing in the body keep their values."""
+    parsed = parse_date(day_date)
+    if parsed is None:
+        return error(400, "Dates must be in YYYY-MM-DD format")
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return error(400, "Body must be a JSON object")
+
+    day = days.get(g.user_id, parsed)
+    form = DayForm(MultiDict({**day.to_dict(), **payload}))
+    if not form.validate():
+        return error(400, "Invalid day", fields=form.errors)
+    return jsonify(days.save(day, form.data).to_dict())
+
+
+@api.route("/days/<day_date>/history", methods=["GET"])
+def day_history(day_date: str) -> Response:
+    """Return every saved version of a day with the fields it changed."""
+    parsed = parse_date(day_date)
+    if parsed is None:
+        return error(400, "Dates must be in YYYY-MM-DD format")
+    return jsonify(versions=days.versions(g.user_id, parsed))
+
+
+def export_status(job: ExportJob) -> dict:
+    status = export_jobs.status(job)
+    if job.status == export_jobs.DONE:
+        status["url"] = url_for("api.export_file", job_id=job.id)
+    return status
+
+
+def user_export(job_id: int) -> Optional[ExportJob]:
+    job = db.session.get(ExportJob, job_id)
+    return job if job is not None and job.user_id == g.user_id else None
+
+
+@api.route("/exports", methods=["POST"])
+def create_export() -> Response:
+    """Start a background export of all days, or return the current one.
+
+    Answers 202 with the status of the job until its file is ready.
+    """
+    payload = request.get_json(silent=True) or {}
+    export_format = payload.get("format", "json")
+    if export_format not in export_jobs.FORMATS:
+        return error(400, f"Format must be one of {', '.join(export_jobs.FORMATS)}")
+    job = export_jobs.enqueue(g.user_id, export_format)
+    response = jsonify(export_status(job))
+    response.status_code = 200 if job.status == export_jobs.DONE else 202
+    response.headers["Location"] = url_for("api.get_export", job_id=job.id)
+    return response
+
+
+@api.route("/exports/<int:job_id>", methods=["GET"])
+def get_export(job_id: int) -> Response:
+    job = user_export(job_id)
+    if job is None:
+        return error(404, "Export not found")
+    return jsonify(export_status(job))
+
+
+@api.route("/exports/<int:job_id>/file", methods=["GET"])
+def export_file(job_id: int) -> BaseResponse:
+    job = user_export(job_id)
+    if job is None or job.status != export_jobs.DONE:
+        return error(404, "Export not found or not finished")
+    return export_jobs.send(job)
+
+
+def sync_dict(day: Day) -> dict:
+    return {**day.to_dict(), "updated": day.updated.isoformat()}
+
+
+def encode_cursor(day: Day) -> str:
+    return f"{day.revision}_{day.id}"
+
+
+def head_cursor(user_id: int) -> str:
+    """Return a cursor past every change of the user's days so far."""
+    revision = db.session.scalar(select(User.revision).where(User.id == user_id))
+    # revisions are compared first, and no day has the id 0
+    return f"{revision + 1}_0"
+
+
+def parse_updated(value: object) -> Optional[datetime.datetime]:
+    """Parse an ISO timestamp into naive UTC, like the stored ones."""
+    try:
+        updated = datetime.datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if updated.tzinfo:
+        updated = updated.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return updated
+
+
+def decode_cursor(cursor: str) -> Optional[tuple[int, int]]:
+    revision, _, day_id = cursor.partition("_")
+    if not (revision.isdigit() and day_id.isdigit()):
+        return None
+    return int(revision), int(day_id)
+
+
+def select_changes(user_id: int, after: Optional[tuple[int, int]] = None) -> Select:
+    """Select a page of days changed after a decoded cursor, oldest first."""
+    query = (
+        select(Day)
+        .where(Day.user_id == user_id)
+        .order_by(Day.revision, Day.id)
+        .limit(SYNC_PAGE_SIZE + 1)
+    )
+    if after is not None:
+        revision, day_id = after
+        # days saved in one batch share their revision
+        query = query.where(
+            or_(
+                Day.revision > revision,
+                and_(Day.revision == revision, Day.id > day_id),
+            )
+        )
+    return query
+
+
+@api.route("/sync", methods=["GET"])
+def pull() -> Response:
+    """Return days changed after ``cursor``, in the order they changed.
+
+    Clients keep the returned ``cursor`` as their high-water mark and ask
+    again while ``more`` is true. Without a cursor all days are returned,
+    the cursor ``head`` returns none and the cursor of the latest change.
+
+    Cursors follow the revisions of the user, which are taken under a lock
+    of the user and so commit in their order, unlike the saves' timestamps.
+    """
+    cursor = request.args.get("cursor")
+    if cursor == "head":
+        return jsonify(days=[], cursor=head_cursor(g.user_id), more=False)
+    decoded = None
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            return error(400, "Invalid cursor")
+
+    found = db.session.scalars(select_changes(g.user_id, decoded)).all()
+    changed = found[:SYNC_PAGE_SIZE]
+    return jsonify(
+        days=[sync_dict(day) for day in changed],
+        cursor=encode_cursor(changed[-1]) if changed else cursor,
+        more=len(found) > SYNC_PAGE_SIZE,
+    )
+
+
+@api.route("/sync", methods=["POST"])
+def push() -> Response:
+    """Save days edited offline, the latest edit of a day wins.
+
+    Every day carries ``updated``, the time it was edited on the client.
+    Days changed on the server after that are not saved and are returned as
+    conflicts, so the client can take the server's version. Invalid days are
+    returned as rejected with their index and error, the valid ones are
+    saved anyway.
+    """
+    items, response = bulk_days()
+    if response:
+        return response
+    defaults = Day.default(g.user_id, None).to_dict()
+    edited = []
+    rejected = []
+    for index, item in enumerate(items):
+        data, problem = validate_day(item, defaults)
+        updated = parse_updated(item.get("updated"))
+        if problem is None and updated is None:
+            problem = {"error": "Days must have an ISO updated timestamp"}
+        if problem is not None:
+            rejected.append({"index": index, "date": item.get("date"), **problem})
+        else:
+            edited.append((updated, data))
+
+    stored = {
+        day.date: day
+        for day in db.session.scalars(
+            select(Day).where(
+                Day.user_id == g.user_id,
+                Day.date.in_([data["date"] for _, data in edited]),
+            )
+        ).all()
+    }
+    accepted = []
+    conflicts = []
+    for updated, data in edited:
+        day = stored.get(data["date"])
+        if day is not None and day.updated > updated:
+            conflicts.append(sync_dict(day))
+        else:
+            accepted.append(data)
+
+    days.save_many(g.user_id, accepted)
+    return jsonify(saved=len(accepted), conflicts=conflicts, rejected=rejected)
+
+
+@click.command("crms-api-token")
+@click.argument("username")
+@with_appcontext
+def issue_token(username: str) -> None:
+    """Issue a new API token for a user, replacing the previous one."""
+    user = User.query.filter_by(name=username).first()
+    if not user:
+        raise click.ClickException(f"User {username} does not exist")
+    api_token = user.issue_api_token()
+    db.session.commit()
+    click.echo(api_token)
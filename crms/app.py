@@ -1,12 +1,28 @@
-from typing import Any
+from typing import Any, Optional
 
+import click
 import flask_login
 import structlog
 from flask import Flask, Response, request
 from flask_login import login_required
 from flask_migrate import Migrate
+from sqlalchemy.engine import make_url
+from werkzeug.utils import import_string
 
-from crms import config, views
+from crms import (
+    api,
+    config,
+    cycles,
+    history,
+    importer,
+    instrumentation,
+    metrics,
+    profiler,
+    query_plans,
+    seed,
+    stamps,
+    views,
+)
 from crms.login_manager import login_manager
 from crms.models import db
 
@@ -15,6 +31,35 @@ logger = structlog.getLogger()
 migrate = Migrate(compare_type=True)
 
 
+class LazyGroup(click.Group):
+    """Command group imported only when it is run, as the benchmarks import
+    the app themselves."""
+
+    def __init__(self, name: str, import_name: str, **kwargs: Any) -> None:
+        super().__init__(name, **kwargs)
+        self.import_name = import_name
+
+    def _group(self) -> click.Group:
+        return import_string(self.import_name)
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return self._group().list_commands(ctx)
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        return self._group().get_command(ctx, cmd_name)
+
+
+def pool_options() -> dict:
+    """Options of the connection pool of a worker, see crms.config."""
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_POOL_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
 def create_app(*_: Any, **kwargs: Any) -> Flask:
     """Create an application with all required setup."""
 
@@ -23,20 +68,50 @@ def create_app(*_: Any, **kwargs: Any) -> Flask:
     app.secret_key = config.SECRET_KEY.encode()
     app.config.update(**kwargs)
 
+    if make_url(app.config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() != "sqlite":
+        options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        for option, value in pool_options().items():
+            options.setdefault(option, value)
+
+    metrics.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    instrumentation.init_app(app)
+    profiler.init_app(app)
 
     app.register_blueprint(views.app)
+    app.register_blueprint(api.api)
+
+    app.cli.add_command(api.issue_token)
+    app.cli.add_command(
+        LazyGroup(
+            "crms-bench",
+            "crms.bench:bench",
+            help="Benchmarks run against a throwaway SQLite database.",
+        )
+    )
+    app.cli.add_command(cycles.backfill)
+    app.cli.add_command(history.history)
+    app.cli.add_command(importer.import_file)
+    app.cli.add_command(profiler.profile_token)
+    app.cli.add_command(query_plans.check_query_plans)
+    app.cli.add_command(seed.seed_users)
+    app.cli.add_command(stamps.backfill)
+    app.cli.add_command(stamps.check)
 
     @app.after_request
     def log_request_info(response: Response) -> Response:
+        timings = instrumentation.timings()
+        if timings:
+            response.headers["Server-Timing"] = instrumentation.server_timing(timings)
         if request.path != "/ping":
             logger.info(
                 "crms.request",
                 path=request.path,
                 status_code=response.status_code,
                 user_agent=request.headers.get("user-agent"),
+                **timings,
             )
         return response
 
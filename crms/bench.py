@@ -0,0 +1,824 @@
+"""Benchmarks run against a throwaway SQLite database.
+
+Usage::
+
+    flask crms-bench export --rows 1000 --rows 100000
+    flask crms-bench suite --years 1 --years 20 --save baseline.json
+    flask crms-bench suite --years 1 --years 20 --baseline baseline.json
+    flask crms-bench rows --years 5 --years 50
+    flask crms-bench budget
+    flask crms-bench formats --years 5 --years 50
+    flask crms-bench load --server sync:1:1 --server gthread:2:4
+"""
+import csv
+import datetime
+import gzip
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import Callable, Iterator, Optional, Sequence
+from urllib.parse import urlencode
+
+import click
+import structlog
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import event, inspect, select
+from sqlalchemy.engine import Engine
+from werkzeug.security import generate_password_hash
+from werkzeug.test import TestResponse
+
+from crms import export
+from crms.app import create_app
+from crms.models import Day, User, db
+from crms.rows import DayRow, iter_rows, select_days
+from crms.seed import seed_user
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class Measurement:
+    ttfb: float
+    total: float
+    peak_memory: int
+    body_size: int
+
+    def format(self) -> str:
+        return (
+            f"{self.ttfb * 1000:9.1f} ms ttfb"
+            f"{self.total * 1000:10.1f} ms total"
+            f"{self.peak_memory / 1024:10.0f} KiB peak"
+            f"{self.body_size / 1024:10.0f} KiB body"
+        )
+
+
+@contextmanager
+def bench_app(database_url: Optional[str] = None) -> Iterator[Flask]:
+    """Create an application backed by a fresh database with one user.
+
+    The database is a temporary SQLite file, unless ``database_url`` of an
+    empty scratch database is given. A database with any table is refused,
+    so dropping the tables afterwards only drops what the benchmark created.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(
+            SQLALCHEMY_DATABASE_URI=database_url
+            or "sqlite:///" + os.path.join(tmp, "bench.db")
+        )
+        with app.app_context():
+            if database_url and inspect(db.engine).get_table_names():
+                db.engine.dispose()
+                raise click.ClickException(
+                    "The benchmark needs an empty scratch database, "
+                    "the one of --database-url has tables"
+                )
+            db.create_all()
+            User.create(
+                name=BENCH_USER,
+                password=generate_password_hash(BENCH_PASSWORD),
+                commit=True,
+            )
+        try:
+            yield app
+        finally:
+            with app.app_context():
+                if database_url:
+                    db.drop_all()
+                db.engine.dispose()
+
+
+def seed_days(app: Flask, count: int) -> None:
+    with app.app_context():
+        user = User.query.filter_by(name=BENCH_USER).one()
+        start = datetime.date.today() - datetime.timedelta(days=count)
+        db.session.add_all(
+            Day.default(user.id, start + datetime.timedelta(days=i))
+            for i in range(count)
+        )
+        db.session.commit()
+
+
+def login(app: Flask) -> FlaskClient:
+    client = app.test_client()
+    client.post("/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+    return client
+
+
+def measure(client: FlaskClient, url: str) -> Measurement:
+    """Fetch ``url`` chunk by chunk, tracking time to first byte and peak memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    ttfb = None
+    body_size = 0
+    response = client.get(url, buffered=False)
+    for chunk in response.response:
+        if ttfb is None:
+            ttfb = time.perf_counter() - start
+        body_size += len(chunk)
+    response.close()
+    total = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return Measurement(ttfb or total, total, peak_memory, body_size)
+
+
+@click.group("crms-bench")
+def bench() -> None:
+    """Benchmarks run against a throwaway SQLite database."""
+    # Keep the per-request log lines out of the report.
+    structlog.configure(logger_factory=structlog.ReturnLoggerFactory())
+
+
+@bench.command("export")
+@click.option(
+    "--rows",
+    "-n",
+    type=int,
+    multiple=True,
+    default=(1_000, 10_000, 50_000),
+    show_default=True,
+    help="Number of days to export, may be repeated.",
+)
+@click.option(
+    "--url",
+    default="/export",
+    show_default=True,
+    help="Export endpoint to measure.",
+)
+def bench_export(rows: tuple[int, ...], url: str) -> None:
+    """Measure latency and peak memory of an export as the history grows."""
+    for count in rows:
+        with bench_app() as app:
+            seed_days(app, count)
+            result = measure(login(app), url)
+        click.echo(f"{count:>8} rows {result.format()}")
+
+
+def observation(day_date: datetime.date) -> dict:
+    return {
+        "category": "red",
+        "menstrual": "M",
+        "indicator": "N/A",
+        "color": "N/A",
+        "sensation": "N/A",
+        "frequency": "N/A",
+        "day_count": "0",
+        "arrow": "",
+        "notes": "",
+        "new_cycle": day_date.day == 1,
+        "date": day_date.isoformat(),
+    }
+
+
+def form_data(day_date: datetime.date) -> dict:
+    """The observation as posted by the day form, unchecked boxes are left out."""
+    return {k: v for k, v in observation(day_date).items() if v is not False}
+
+
+def _expect(response: TestResponse, status: int) -> None:
+    if response.status_code != status:
+        raise click.ClickException(
+            f"{response.request.path} answered {response.status_code}, not {status}"
+        )
+
+
+def _expect_saved(app: Flask, count: int) -> None:
+    """Fail unless the bench user has ``count`` days, as the day form answers
+    200 whether it saved the day or not."""
+    with app.app_context():
+        saved = db.session.scalar(select(db.func.count()).select_from(Day))
+    if saved != count:
+        raise click.ClickException(f"{saved} of {count} days were saved")
+
+
+@bench.command("upsert")
+@click.option(
+    "--days",
+    "-n",
+    type=int,
+    multiple=True,
+    default=(7, 100, 1_000),
+    show_default=True,
+    help="Number of days to save, may be repeated.",
+)
+def bench_upsert(days: tuple[int, ...]) -> None:
+    """Compare saving days one form post at a time with one bulk API call."""
+    for count in days:
+        start = datetime.date.today() - datetime.timedelta(days=count)
+        dates = [start + datetime.timedelta(days=i) for i in range(count)]
+
+        with bench_app() as app:
+            client = login(app)
+            began = time.perf_counter()
+            for day_date in dates:
+                response = client.post(f"/?day={day_date}", data=form_data(day_date))
+                _expect(response, 200)
+            per_request = time.perf_counter() - began
+            _expect_saved(app, count)
+
+        with bench_app() as app:
+            client = app.test_client()
+            token = client.post(
+                "/api/v1/token",
+                json={"username": BENCH_USER, "password": BENCH_PASSWORD},
+            ).json["token"]
+            began = time.perf_counter()
+            response = client.post(
+                "/api/v1/days",
+                json={"days": [observation(day_date) for day_date in dates]},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            bulk = time.perf_counter() - began
+            _expect(response, 200)
+            _expect_saved(app, count)
+
+        click.echo(
+            f"{count:>8} days"
+            f"{per_request * 1000:10.1f} ms per request"
+            f"{bulk * 1000:10.1f} ms bulk"
+            f"{per_request / bulk:8.1f}x"
+        )
+
+
+@dataclass
+class Result:
+    scenario: str
+    years: float
+    days: int
+    p50: float
+    p90: float
+    p99: float
+    queries: float
+    peak_memory: int
+
+    def format(self) -> str:
+        return (
+            f"{self.scenario:<12}{self.years:>6g} y{self.days:>7} days"
+            f"{self.p50 * 1000:9.1f} ms p50"
+            f"{self.p90 * 1000:9.1f} ms p90"
+            f"{self.p99 * 1000:9.1f} ms p99"
+            f"{self.queries:7.1f} queries"
+            f"{self.peak_memory / 1024:9.0f} KiB peak"
+        )
+
+
+def scenarios(rng: random.Random, dates: list[datetime.date], token: str) -> dict:
+    """Requests of the suite, as functions sending one to a client."""
+    api = {"Authorization": f"Bearer {token}"}
+    return {
+        "ping": lambda c: c.get("/ping"),
+        "login": lambda c: c.application.test_client().post(
+            "/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD}
+        ),
+        "index": lambda c: c.get(f"/?day={rng.choice(dates)}"),
+        "save": lambda c: c.post(
+            f"/?day={(day_date := rng.choice(dates))}",
+            data=form_data(day_date),
+        ),
+        "overview": lambda c: c.get("/overview"),
+        "export_json": lambda c: c.get("/export"),
+        "export_csv": lambda c: c.get("/export_csv"),
+        "api_day": lambda c: c.get(f"/api/v1/days/{rng.choice(dates)}", headers=api),
+        "api_put": lambda c: c.put(
+            f"/api/v1/days/{rng.choice(dates)}",
+            json={"notes": f"{rng.random():.6f}"},
+            headers=api,
+        ),
+    }
+
+
+# Most statements one request of a scenario may run, asserted by
+# tests/test_budgets.py and checked on a seeded history by
+# ``crms-bench budget``. Lower them when a change saves queries.
+BUDGETS = {
+    "ping": 0,
+    "login": 1,
+    "index": 2,
+    "save": 9,
+    "overview": 3,
+    "export_json": 2,
+    "export_csv": 2,
+    "api_day": 2,
+    "api_put": 9,
+}
+
+
+def seed_bench_user(
+    app: Flask, years: float, rng: random.Random
+) -> tuple[int, list[datetime.date], str, Engine]:
+    """Seed the history of the bench user and issue their API token.
+
+    Returns the number of days, their dates, the token and the engine.
+    """
+    with app.app_context():
+        user = User.query.filter_by(name=BENCH_USER).one()
+        count = seed_user(user.id, years, rng)
+        token = user.issue_api_token()
+        db.session.commit()
+        dates = list(db.session.scalars(select(Day.date)))
+        return count, dates, token, db.engine
+
+
+def run_scenario(
+    name: str,
+    send: Callable[[FlaskClient], TestResponse],
+    client: FlaskClient,
+    repeat: int,
+    engine: Engine,
+) -> tuple[list[float], list[int], int]:
+    """Send a request ``repeat`` times, returning the latencies, the numbers
+    of queries and the peak memory of one more traced request.
+
+    Requests are sent outside of an app context, so each one has its own
+    session, like in production.
+    """
+    queries = 0
+
+    def count(*_: object) -> None:
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine, "after_cursor_execute", count)
+    latencies = []
+    counts = []
+    try:
+        for _ in range(repeat):
+            queries = 0
+            began = time.perf_counter()
+            response = send(client)
+            response.get_data()
+            latencies.append(time.perf_counter() - began)
+            counts.append(queries)
+            if response.status_code >= 400:
+                raise click.ClickException(f"{name}: {response.status}")
+    finally:
+        event.remove(engine, "after_cursor_execute", count)
+
+    tracemalloc.start()
+    send(client).get_data()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, counts, peak_memory
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def compare(results: list[Result], baseline: list[dict], tolerance: float) -> None:
+    """Print changes against a saved baseline and fail on regressions."""
+    previous = {(r["scenario"], r["years"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result.scenario, result.years))
+        if before is None:
+            continue
+        change = result.p50 / before["p50"] - 1
+        line = (
+            f"{result.scenario:<12}{result.years:>6g} y"
+            f"{change * 100:+8.1f} % p50"
+            f"{result.queries - before['queries']:+8.1f} queries"
+        )
+        if change > tolerance or result.queries > before["queries"]:
+            regressions.append(line)
+            line += "  REGRESSION"
+        click.echo(line)
+    if regressions:
+        raise click.ClickException(f"{len(regressions)} regressions")
+
+
+@bench.command("suite")
+@click.option(
+    "--years",
+    "-y",
+    type=float,
+    multiple=True,
+    default=(1, 5, 20),
+    show_default=True,
+    help="Years of seeded history, may be repeated.",
+)
+@click.option("--repeat", "-r", default=20, show_default=True)
+@click.option("--seed", default=0, show_default=True, help="Seed of the data.")
+@click.option(
+    "--scenario",
+    "-s",
+    "selected",
+    multiple=True,
+    help=f"Run only these scenarios: {', '.join(BUDGETS)}.",
+)
+@click.option(
+    "--database-url",
+    help="Empty scratch database, e.g. MySQL, used instead of SQLite.",
+)
+@click.option("--save", type=click.Path(dir_okay=False), help="Save the results.")
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Compare with results saved before.",
+)
+@click.option(
+    "--tolerance",
+    default=0.2,
+    show_default=True,
+    help="Slowdown of the p50 latency counted as a regression.",
+)
+def bench_suite(
+    years: tuple[float, ...],
+    repeat: int,
+    seed: int,
+    selected: tuple[str, ...],
+    database_url: Optional[str],
+    save: Optional[str],
+    baseline: Optional[str],
+    tolerance: float,
+) -> None:
+    """Measure the main views on seeded histories of growing size.
+
+    Reports latency percentiles, queries per request and peak memory.
+    """
+    results = []
+    for size in years:
+        with bench_app(database_url) as app:
+            rng = random.Random(seed)
+            count, dates, token, engine = seed_bench_user(app, size, rng)
+            client = login(app)
+            for name, send in scenarios(rng, dates, token).items():
+                if selected and name not in selected:
+                    continue
+                latencies, counts, peak_memory = run_scenario(
+                    name, send, client, repeat, engine
+                )
+                result = Result(
+                    name,
+                    size,
+                    count,
+                    percentile(latencies, 50),
+                    percentile(latencies, 90),
+                    percentile(latencies, 99),
+                    statistics.mean(counts),
+                    peak_memory,
+                )
+                click.echo(result.format())
+                results.append(result)
+
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            compare(results, json.load(f), tolerance)
+
+
+@bench.command("budget")
+@click.option("--years", "-y", default=5.0, show_default=True)
+@click.option("--repeat", "-r", default=20, show_default=True)
+@click.option("--seed", default=0, show_default=True, help="Seed of the data.")
+def bench_budget(years: float, repeat: int, seed: int) -> None:
+    """Fail when a request runs more statements than the budget of its view."""
+    over = []
+    with bench_app() as app:
+        rng = random.Random(seed)
+        _, dates, token, engine = seed_bench_user(app, years, rng)
+        client = login(app)
+        for name, send in scenarios(rng, dates, token).items():
+            _, counts, _ = run_scenario(name, send, client, repeat, engine)
+            line = f"{name:<12}{max(counts):>4} queries{BUDGETS[name]:>4} budget"
+            if max(counts) > BUDGETS[name]:
+                over.append(name)
+                line += "  OVER BUDGET"
+            click.echo(line)
+    if over:
+        raise click.ClickException(f"Over budget: {', '.join(over)}")
+
+
+def load(query: Callable[[], Sequence]) -> tuple[float, int]:
+    """Return the time and the memory taken by the loaded list of days."""
+    db.session.expunge_all()
+    tracemalloc.start()
+    loaded = query()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loaded
+    db.session.expunge_all()
+    began = time.perf_counter()
+    query()
+    seconds = time.perf_counter() - began
+    db.session.expunge_all()
+    return seconds, memory
+
+
+def _entities(user_id: int) -> Sequence[Day]:
+    return db.session.scalars(
+        select(Day).where(Day.user_id == user_id).order_by(Day.date)
+    ).all()
+
+
+def _rows(user_id: int) -> Sequence[DayRow]:
+    return list(iter_rows(select_days(user_id)))
+
+
+@bench.command("rows")
+@click.option(
+    "--years",
+    "-y",
+    type=float,
+    multiple=True,
+    default=(5, 20, 50),
+    show_default=True,
+    help="Years of seeded history, may be repeated.",
+)
+def bench_rows(years: tuple[float, ...]) -> None:
+    """Compare loading days as Day entities and as read-only rows."""
+    for size in years:
+        with bench_app() as app, app.app_context():
+            user_id = User.query.filter_by(name=BENCH_USER).one().id
+            count = seed_user(user_id, size, random.Random(0))
+            entities = load(partial(_entities, user_id))
+            rows = load(partial(_rows, user_id))
+        for name, (seconds, memory) in (("entities", entities), ("rows", rows)):
+            click.echo(
+                f"{count:>8} days {name:<9}"
+                f"{seconds * 1000:9.1f} ms"
+                f"{memory / count:9.0f} B per day"
+            )
+
+
+def _read_parquet(data: bytes) -> object:
+    import pyarrow.parquet  # pylint:disable=import-outside-toplevel
+
+    return pyarrow.parquet.read_table(io.BytesIO(data))
+
+
+# encoding of the whole export and reading of its file, by format
+FORMATS: dict[str, tuple[Callable[[int], bytes], Callable[[bytes], object]]] = {
+    "json": (
+        lambda user_id: "".join(export.iter_json(user_id)).encode(),
+        json.loads,
+    ),
+    "csv": (
+        lambda user_id: b"".join(export.iter_csv(user_id)),
+        lambda data: list(csv.DictReader(io.StringIO(data.decode()))),
+    ),
+    "parquet": (
+        lambda user_id: b"".join(export.iter_parquet(user_id)),
+        _read_parquet,
+    ),
+}
+
+
+@bench.command("formats")
+@click.option(
+    "--years",
+    "-y",
+    type=float,
+    multiple=True,
+    default=(5, 50),
+    show_default=True,
+    help="Years of seeded history, may be repeated.",
+)
+def bench_formats(years: tuple[float, ...]) -> None:
+    """Compare the size of the exports and the time to write and read them."""
+    for size in years:
+        with bench_app() as app, app.app_context():
+            user_id = User.query.filter_by(name=BENCH_USER).one().id
+            count = seed_user(user_id, size, random.Random(0))
+            for name, (encode, decode) in FORMATS.items():
+                began = time.perf_counter()
+                data = encode(user_id)
+                written = time.perf_counter() - began
+                # warms up imports and caches of the reader
+                decode(data)
+                began = time.perf_counter()
+                decode(data)
+                read = time.perf_counter() - began
+                click.echo(
+                    f"{count:>8} days {name:<8}"
+                    f"{len(data) / 1024:9.0f} KiB"
+                    f"{len(gzip.compress(data)) / 1024:9.0f} KiB gzipped"
+                    f"{written * 1000:9.1f} ms written"
+                    f"{read * 1000:9.1f} ms read"
+                )
+
+
+# share of each request in the load test
+LOAD_MIX = {
+    "index": 0.5,
+    "overview": 0.25,
+    "save": 0.1,
+    "export_json": 0.1,
+    "export_csv": 0.05,
+}
+# seconds to wait for a started server to answer
+SERVER_START_TIMEOUT = 30
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(address: str, process: subprocess.Popen, log: str) -> None:
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            connection = http.client.HTTPConnection(address, timeout=1)
+            connection.request("GET", "/login")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    with open(log, encoding="utf-8", errors="replace") as f:
+        output = f.read()[-2000:]
+    raise click.ClickException(f"gunicorn did not start:\n{output}")
+
+
+@contextmanager
+def serve(
+    database_url: str, worker_class: str, workers: int, threads: int
+) -> Iterator[str]:
+    """Run gunicorn configured like in production, yielding its address."""
+    address = f"127.0.0.1:{_free_port()}"
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, "gunicorn.log")
+        env = {
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "GUNICORN_BIND": address,
+            "GUNICORN_WORKER_CLASS": worker_class,
+            "GUNICORN_WORKERS": str(workers),
+            "GUNICORN_THREADS": str(threads),
+            "METRICS_DIR": os.path.join(tmp, "metrics"),
+        }
+        with open(log, "wb") as output:
+            process = subprocess.Popen(  # pylint:disable=consider-using-with
+                [
+                    sys.executable,
+                    "-m",
+                    "gunicorn",
+                    "-c",
+                    "python:crms.gunicorn_config",
+                    "crms.app:create_app()",
+                ],
+                env=env,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                stdout=output,
+                stderr=subprocess.STDOUT,
+            )
+            try:
+                _wait_for_server(address, process, log)
+                yield address
+            finally:
+                process.terminate()
+                process.wait(SERVER_START_TIMEOUT)
+
+
+def _session_cookie(address: str) -> str:
+    connection = http.client.HTTPConnection(address)
+    connection.request(
+        "POST",
+        "/login",
+        body=urlencode({"username": BENCH_USER, "password": BENCH_PASSWORD}),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    response = connection.getresponse()
+    response.read()
+    return "; ".join(
+        cookie.split(";")[0] for cookie in response.headers.get_all("Set-Cookie", [])
+    )
+
+
+def _load_request(name: str, day_date: datetime.date) -> tuple[str, str, str]:
+    """Return the method, path and form body of a request of the load test."""
+    if name == "save":
+        return "POST", f"/?day={day_date}", urlencode(form_data(day_date))
+    paths = {
+        "index": f"/?day={day_date}",
+        "overview": "/overview",
+        "export_json": "/export",
+        "export_csv": "/export_csv",
+    }
+    return "GET", paths[name], ""
+
+
+def _send_load(
+    address: str,
+    cookie: str,
+    dates: list[datetime.date],
+    seed: int,
+    deadline: float,
+    results: list[tuple[str, float, int]],
+) -> None:
+    """Keep sending requests of the mix until the deadline."""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(address, timeout=120)
+    headers = {"Cookie": cookie, "Content-Type": "application/x-www-form-urlencoded"}
+    while time.perf_counter() < deadline:
+        (name,) = rng.choices(list(LOAD_MIX), weights=list(LOAD_MIX.values()))
+        method, path, body = _load_request(name, rng.choice(dates))
+        began = time.perf_counter()
+        try:
+            connection.request(method, path, body=body or None, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except OSError:
+            connection.close()
+            status = 0
+        # list.append is atomic, the threads need no lock
+        results.append((name, time.perf_counter() - began, status))
+
+
+@bench.command("load")
+@click.option(
+    "--server",
+    "-s",
+    "servers",
+    multiple=True,
+    default=("sync:1:1", "gthread:1:4", "gthread:2:4"),
+    show_default=True,
+    help="WORKER_CLASS:WORKERS:THREADS of gunicorn, may be repeated.",
+)
+@click.option("--concurrency", "-c", default=8, show_default=True)
+@click.option("--duration", "-d", default=10.0, show_default=True, help="Seconds.")
+@click.option("--years", "-y", default=20.0, show_default=True)
+@click.option("--seed", default=0, show_default=True, help="Seed of the data.")
+@click.option(
+    "--database-url",
+    help="Empty scratch database, e.g. MySQL, used instead of SQLite.",
+)
+def bench_load(
+    servers: tuple[str, ...],
+    concurrency: int,
+    duration: float,
+    years: float,
+    seed: int,
+    database_url: Optional[str],
+) -> None:
+    """Compare the throughput of gunicorn configurations under load.
+
+    Concurrent clients keep sending a mix of page views, saves and slow
+    exports to a gunicorn started for each configuration. Latencies are
+    reported without the exports.
+    """
+    parsed = []
+    for server in servers:
+        worker_class, _, rest = server.partition(":")
+        worker_count, _, thread_count = rest.partition(":")
+        if not (worker_count.isdigit() and thread_count.isdigit()):
+            raise click.BadParameter(f"{server} is not WORKER_CLASS:WORKERS:THREADS")
+        parsed.append((server, worker_class, int(worker_count), int(thread_count)))
+
+    with bench_app(database_url) as app:
+        _, dates, _, engine = seed_bench_user(app, years, random.Random(seed))
+        engine.dispose()
+        for server, worker_class, workers, threads in parsed:
+            with serve(
+                app.config["SQLALCHEMY_DATABASE_URI"], worker_class, workers, threads
+            ) as address:
+                cookie = _session_cookie(address)
+                results: list[tuple[str, float, int]] = []
+                deadline = time.perf_counter() + duration
+                clients = [
+                    threading.Thread(
+                        target=_send_load,
+                        args=(address, cookie, dates, seed + i, deadline, results),
+                    )
+                    for i in range(concurrency)
+                ]
+                began = time.perf_counter()
+                for client in clients:
+                    client.start()
+                for client in clients:
+                    client.join()
+                elapsed = time.perf_counter() - began
+
+            pages = [
+                latency for name, latency, _ in results if not name.startswith("export")
+            ]
+            errors = sum(1 for *_, status in results if not 200 <= status < 400)
+            click.echo(
+                f"{server:<14}{len(results) / elapsed:8.1f} req/s"
+                f"{percentile(pages, 50) * 1000:9.1f} ms p50"
+                f"{percentile(pages, 99) * 1000:9.1f} ms p99"
+                f"{errors:6} errors"
+            )
@@ -0,0 +1,141 @@
+"""Cache of rendered fragments, such as the rows of the overview.
+
+Keys are versioned by the revision of what they render, so entries never
+need to be invalidated explicitly: a change produces a new key and the old
+entry ages out of the backend.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Protocol
+
+from crms import config
+from crms.metrics import FRAGMENT_LOOKUPS
+
+
+class Backend(Protocol):
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    def set(self, key: str, value: str) -> None:
+        ...
+
+
+class MemoryBackend:
+    """Least recently used entries of this process, bounded by their size."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_size and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class FileSystemBackend:
+    """Entries in a directory shared by the workers, expired by their age."""
+
+    # sweep expired entries once per this many writes
+    SWEEP_EVERY = 1000
+
+    def __init__(self, directory: str, ttl: int) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.writes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            if path.stat().st_mtime < time.time() - self.ttl:
+                return None
+            return path.read_text()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".")
+        with os.fdopen(fd, "w") as f:
+            f.write(value)
+        os.replace(tmp, self._path(key))
+
+        self.writes += 1
+        if self.writes % self.SWEEP_EVERY == 0:
+            self.sweep()
+
+    def sweep(self) -> None:
+        expired = time.time() - self.ttl
+        for path in self.directory.iterdir():
+            try:
+                if path.stat().st_mtime < expired:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class RedisBackend:
+    """Entries in Redis or a compatible server, expired by their age."""
+
+    def __init__(self, url: str, ttl: int) -> None:
+        try:
+            import redis  # pylint:disable=import-outside-toplevel
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        return value.decode() if value is not None else None
+
+    def set(self, key: str, value: str) -> None:
+        self.client.setex(key, self.ttl, value)
+
+
+class FragmentCache:
+    def __init__(self, backend: Backend) -> None:
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        FRAGMENT_LOOKUPS.inc(result="miss" if value is None else "hit")
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.backend.set(key, value)
+
+
+def create_backend() -> Backend:
+    if config.CACHE_BACKEND == "memory":
+        return MemoryBackend(config.CACHE_MAX_SIZE)
+    if config.CACHE_BACKEND == "filesystem":
+        return FileSystemBackend(config.CACHE_DIR, config.CACHE_TTL)
+    if config.CACHE_BACKEND == "redis":
+        return RedisBackend(config.CACHE_URL, config.CACHE_TTL)
+    raise ValueError(f"Unknown CACHE_BACKEND {config.CACHE_BACKEND!r}")
+
+
+fragments = FragmentCache(create_backend())
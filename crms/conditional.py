@@ -0,0 +1,70 @@
+"""Conditional GET for views that only depend on the current user's days.
+
+A response is validated by ``User.revision``, which every save of the
+user's days bumps, so a client that already has the current version gets a
+304 without the view running at all.
+"""
+import datetime
+import hashlib
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable
+
+from flask import Response, make_response, request
+from flask_login import current_user
+from sqlalchemy import Select, select
+
+from crms import config
+from crms.models import User, db
+
+TEMPLATES = Path(__file__).parent / "templates"
+
+
+def _templates_digest() -> str:
+    digest = hashlib.sha1()
+    for template in sorted(TEMPLATES.glob("*.j2")):
+        digest.update(template.read_bytes())
+    return digest.hexdigest()
+
+
+# Part of every validator, so a deploy changing the markup invalidates them.
+VERSION = f"{config.APP_VERSION}:{_templates_digest()}"
+
+
+def select_revision(user_id: int) -> Select:
+    return select(User.revision).where(User.id == user_id)
+
+
+def revision(user_id: int) -> int:
+    """Return the revision of the user's days, see crms.days.next_revision."""
+    return db.session.scalar(select_revision(user_id)) or 0
+
+
+def conditional(view: Callable) -> Callable:
+    """Answer GET requests with 304 when the user's days did not change.
+
+    Views rendering today's date change at midnight even without new data,
+    so the date is part of the validator too. There is no Last-Modified,
+    timestamps of saves within one second cannot tell them apart.
+    """
+
+    @wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            return view(*args, **kwargs)
+
+        etag = hashlib.sha1(
+            f"{VERSION}:{current_user.id}:{revision(current_user.id)}:"
+            f"{datetime.date.today()}".encode()
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+        response.set_etag(etag)
+        # responses are per user and must be revalidated before reuse
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
@@ -10,3 +10,77 @@ configure_stdlib_logging(DEBUG, timestamp_format="iso")
 
 DATABASE_URL = env("DATABASE_URL")
 SECRET_KEY = env("SECRET_KEY", default="lobobo-bobo-koko")
+# e.g. the git revision, invalidates the ETags of cached pages on deploy
+APP_VERSION = env("APP_VERSION", default="")
+
+# gunicorn, see crms.gunicorn_config: "sync", "gthread" or "gevent", which
+# needs gevent installed
+GUNICORN_WORKER_CLASS = env("GUNICORN_WORKER_CLASS", default="gthread")
+GUNICORN_WORKERS = env("GUNICORN_WORKERS", default=2, cast=int)
+# threads of a gthread worker, gevent workers take this many connections each
+GUNICORN_THREADS = env("GUNICORN_THREADS", default=4, cast=int)
+# seconds a sync worker may take for a request, and how long other workers
+# have to check in before they are restarted
+GUNICORN_TIMEOUT = env("GUNICORN_TIMEOUT", default=60, cast=int)
+GUNICORN_BIND = env("GUNICORN_BIND", default=":8080")
+
+# connection pool of each worker, not used with SQLite
+DB_POOL_SIZE = env("DB_POOL_SIZE", default=GUNICORN_THREADS, cast=int)
+# connections opened over the size when all are in use
+DB_POOL_MAX_OVERFLOW = env("DB_POOL_MAX_OVERFLOW", default=GUNICORN_THREADS, cast=int)
+# seconds to wait for a connection before failing the request
+DB_POOL_TIMEOUT = env("DB_POOL_TIMEOUT", default=10, cast=int)
+# seconds after which a connection is replaced, shorter than MySQL's
+# wait_timeout and the idle timeouts of proxies in between
+DB_POOL_RECYCLE = env("DB_POOL_RECYCLE", default=1800, cast=int)
+# test connections when they are taken from the pool
+DB_POOL_PRE_PING = env("DB_POOL_PRE_PING", default=True, cast=bool)
+
+# statements taking at least this many milliseconds are logged, 0 disables it
+SLOW_QUERY_MS = env("SLOW_QUERY_MS", default=0, cast=int)
+
+# profiles of requests, see crms.profiler
+PROFILE_DIR = env("PROFILE_DIR", default="/tmp/crms-profiles")
+# share of requests profiled without a profiling token, e.g. 0.001
+PROFILE_SAMPLE_RATE = env("PROFILE_SAMPLE_RATE", default=0.0, cast=float)
+# profiles kept in PROFILE_DIR, older ones are deleted
+PROFILE_MAX_FILES = env("PROFILE_MAX_FILES", default=1000, cast=int)
+
+# files of the metrics of each worker, see crms.metrics
+METRICS_DIR = env("METRICS_DIR", default="/tmp/crms-metrics")
+
+# changes of days older than this many days are merged into one per period
+HISTORY_COMPACT_AFTER_DAYS = env("HISTORY_COMPACT_AFTER_DAYS", default=90, cast=int)
+# "day", "week" or "month"
+HISTORY_COMPACT_PERIOD = env("HISTORY_COMPACT_PERIOD", default="month")
+# and the ones older than this many days are moved to the archive
+HISTORY_ARCHIVE_AFTER_DAYS = env("HISTORY_ARCHIVE_AFTER_DAYS", default=730, cast=int)
+HISTORY_ARCHIVE_DIR = env("HISTORY_ARCHIVE_DIR", default="/var/lib/crms/history")
+
+# logged in users kept by each worker and the seconds they are kept, see
+# crms.login_manager
+USER_CACHE_SIZE = env("USER_CACHE_SIZE", default=1024, cast=int)
+USER_CACHE_TTL = env("USER_CACHE_TTL", default=300, cast=int)
+
+# gzipped exports written in the background, see crms.export_jobs
+EXPORT_DIR = env("EXPORT_DIR", default="/var/lib/crms/exports")
+# exports written at once by each gunicorn worker
+EXPORT_THREADS = env("EXPORT_THREADS", default=2, cast=int)
+# seconds without progress after which an export is considered lost, e.g. by
+# a restart of its worker, and is run again when requested
+EXPORT_STALE_AFTER = env("EXPORT_STALE_AFTER", default=300, cast=int)
+# serve finished exports by X-Sendfile, the proxy in front must support it
+EXPORT_X_SENDFILE = env("EXPORT_X_SENDFILE", default=False, cast=bool)
+
+# number of cycles rendered with the overview, older ones are fetched on scroll
+OVERVIEW_CYCLES = env("OVERVIEW_CYCLES", default=12, cast=int)
+
+# cache of rendered cycles: "memory" is per worker, "filesystem" and "redis"
+# are shared by all workers
+CACHE_BACKEND = env("CACHE_BACKEND", default="memory")
+# characters kept by the memory backend
+CACHE_MAX_SIZE = env("CACHE_MAX_SIZE", default=16 * 1024 * 1024, cast=int)
+CACHE_DIR = env("CACHE_DIR", default="/tmp/crms-cache")
+CACHE_URL = env("CACHE_URL", default="redis://localhost:6379/0")
+# seconds entries live in the shared backends
+CACHE_TTL = env("CACHE_TTL", default=30 * 24 * 60 * 60, cast=int)
@@ -0,0 +1,204 @@
+import datetime
+from typing import Any, Iterable, Iterator, Optional
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Select, delete, select
+
+from crms.models import Cycle, Day, User, db
+from crms.rows import DayRow, iter_rows, select_days
+
+
+def build(user_id: int, days: Iterable[Any], revision: int = 0) -> Iterator[Cycle]:
+    """Split days ordered by date into cycles of the user's ``revision``.
+
+    Days need a ``date``, ``new_cycle`` and ``peak``.
+
+    A cycle starts with the first day and with every day marked as
+    ``new_cycle``.
+    """
+    cycle = None
+    for day in days:
+        if cycle is None or day.new_cycle:
+            if cycle is not None:
+                yield cycle
+            cycle = Cycle(
+                user_id=user_id,
+                start_date=day.date,
+                end_date=day.date,
+                length=0,
+                recorded_days=0,
+                revision=revision,
+            )
+        cycle.end_date = day.date
+        cycle.length = (day.date - cycle.start_date).days + 1
+        cycle.recorded_days += 1
+        if day.peak:
+            cycle.peak_date = day.date
+    if cycle is not None:
+        yield cycle
+
+
+def select_bounds(user_id: int, first: datetime.date, last: datetime.date) -> Select:
+    """Select the start of the last cycle before ``first`` and of the first
+    cycle after ``last``."""
+    return select(
+        select(db.func.max(Cycle.start_date))
+        .where(Cycle.user_id == user_id, Cycle.start_date < first)
+        .scalar_subquery(),
+        select(db.func.min(Cycle.start_date))
+        .where(Cycle.user_id == user_id, Cycle.start_date > last)
+        .scalar_subquery(),
+    )
+
+
+def refresh(
+    user_id: int,
+    revision: int,
+    first: datetime.date,
+    last: Optional[datetime.date] = None,
+) -> None:
+    """Rebuild the cycles affected by saving the days between first and last.
+
+    Only the cycles around the saved days are rebuilt: the one before them,
+    which may absorb them when a ``new_cycle`` flag is cleared, and the ones
+    they fall into. Changed cycles take the ``revision`` the days were saved
+    at. Pending changes must be flushable, the caller commits.
+    """
+    last = last or first
+    lower, upper = db.session.execute(select_bounds(user_id, first, last)).one()
+    if lower is None and upper is not None:
+        # The first cycle may start without a new_cycle flag, so it stops
+        # being a cycle of its own once days are saved before it.
+        upper = db.session.scalar(
+            select(db.func.min(Cycle.start_date)).where(
+                Cycle.user_id == user_id, Cycle.start_date > upper
+            )
+        )
+
+    # rows of the columns cycles are built from, Day entities of the session
+    # may be stale after an upsert
+    days = (
+        select(Day.date, Day.new_cycle, Day.peak)
+        .where(Day.user_id == user_id)
+        .order_by(Day.date)
+    )
+    stored = select(Cycle).where(Cycle.user_id == user_id)
+    if lower is not None:
+        days = days.where(Day.date >= lower)
+        stored = stored.where(Cycle.start_date >= lower)
+    if upper is not None:
+        days = days.where(Day.date < upper)
+        stored = stored.where(Cycle.start_date < upper)
+
+    stale = {cycle.start_date: cycle for cycle in db.session.scalars(stored).all()}
+    for cycle in build(user_id, db.session.execute(days).all(), revision):
+        current = stale.pop(cycle.start_date, None)
+        if current is None:
+            db.session.add(cycle)
+            continue
+        # Cycles keep their revision unless they hold a saved day or their
+        # bounds moved, so renders of untouched cycles stay cached.
+        saved = cycle.start_date <= last and first <= cycle.end_date
+        if saved or _summary(current) != _summary(cycle):
+            current.end_date = cycle.end_date
+            current.length = cycle.length
+            current.peak_date = cycle.peak_date
+            current.recorded_days = cycle.recorded_days
+            current.revision = revision
+    for cycle in stale.values():
+        db.session.delete(cycle)
+
+
+def _summary(cycle: Cycle) -> tuple:
+    return cycle.end_date, cycle.length, cycle.peak_date, cycle.recorded_days
+
+
+def group_days(cycles: Iterable[Cycle], days: Iterable[DayRow]) -> list[list[DayRow]]:
+    """Place days ordered by date into their cycles, padding gaps with None."""
+    grouped = []
+    days = iter(days)
+    day = next(days, None)
+    for cycle in cycles:
+        padded: list[DayRow] = [None] * cycle.length
+        while day is not None and day.date <= cycle.end_date:
+            if day.date >= cycle.start_date:
+                padded[(day.date - cycle.start_date).days] = day
+            day = next(days, None)
+        grouped.append(padded)
+    return grouped
+
+
+def select_page(
+    user_id: int, limit: int, before: Optional[datetime.date] = None
+) -> Select:
+    """Select ``limit`` cycles starting before ``before`` and one more, newest
+    first."""
+    query = (
+        select(Cycle)
+        .where(Cycle.user_id == user_id)
+        .order_by(Cycle.start_date.desc())
+        .limit(limit + 1)
+    )
+    if before is not None:
+        query = query.where(Cycle.start_date < before)
+    return query
+
+
+def page(
+    user_id: int, limit: int, before: Optional[datetime.date] = None
+) -> tuple[list[Cycle], Optional[datetime.date]]:
+    """Return up to ``limit`` cycles starting before ``before``, oldest first.
+
+    Pages are addressed by the start of their oldest cycle, so fetching one
+    costs the same however long the history is. Returns the cycles and the
+    key of the next, older page if there is one.
+    """
+    found = list(db.session.scalars(select_page(user_id, limit, before)))
+    cycles = found[:limit][::-1]
+    older = cycles[0].start_date if len(found) > limit else None
+    return cycles, older
+
+
+def select_between(user_id: int, start: datetime.date, end: datetime.date) -> Select:
+    """Select rows of the user's days from ``start`` to ``end``."""
+    return select_days(user_id).where(Day.date >= start, Day.date <= end)
+
+
+def cells(user_id: int, cycles: list[Cycle]) -> list[list[DayRow]]:
+    """Load the days of cycles ordered by start, padded with None for gaps."""
+    if not cycles:
+        return []
+    query = select_between(user_id, cycles[0].start_date, cycles[-1].end_date)
+    return group_days(cycles, iter_rows(query))
+
+
+@click.command("crms-backfill-cycles")
+@click.option(
+    "--all", "rebuild_all", is_flag=True, help="Rebuild users with cycles too."
+)
+@with_appcontext
+def backfill(rebuild_all: bool) -> None:
+    """Build the cycles of users from their days.
+
+    By default only users without any cycle are processed, so it is cheap to
+    run on every deploy.
+    """
+    users = select(User.id, User.revision)
+    if not rebuild_all:
+        users = users.where(~User.cycles.any())
+    for user_id, revision in db.session.execute(users).all():
+        db.session.execute(delete(Cycle).where(Cycle.user_id == user_id))
+        days = (
+            select(Day.date, Day.new_cycle, Day.peak)
+            .where(Day.user_id == user_id)
+            .order_by(Day.date)
+            .execution_options(yield_per=500)
+        )
+        count = 0
+        for cycle in build(user_id, db.session.execute(days), revision):
+            db.session.add(cycle)
+            count += 1
+        db.session.commit()
+        if count:
+            click.echo(f"user {user_id}: {count} cycles")
@@ -0,0 +1,244 @@
+import datetime
+from typing import Union
+
+from sqlalchemy import Insert, Select, func, insert, select, update
+from sqlalchemy.dialects import mysql, sqlite
+
+from crms import cycles
+from crms.models import Day, DayHistory, User, db
+
+# Columns set from a DayForm, see Day.from_dict.
+FIELDS = (
+    "category",
+    "menstrual",
+    "indicator",
+    "color",
+    "sensation",
+    "frequency",
+    "peak",
+    "day_count",
+    "arrow",
+    "intercourse",
+    "new_cycle",
+    "notes",
+)
+
+# Rows written by a single INSERT statement.
+BATCH_SIZE = 500
+
+
+def snapshot(day: Union[Day, dict]) -> dict:
+    """Return the FIELDS of a day or of form data, typed like the stored ones."""
+    if isinstance(day, dict):
+        state = {field: day.get(field) for field in FIELDS}
+    else:
+        state = {field: getattr(day, field) for field in FIELDS}
+    if state["day_count"] is not None:
+        state["day_count"] = int(state["day_count"])
+    return state
+
+
+def diff(before: dict, after: dict) -> dict:
+    """Return the fields of ``after`` that differ from ``before``."""
+    return {field: after[field] for field in FIELDS if after[field] != before[field]}
+
+
+# Every day starts as the default one, its history changes it from there.
+DEFAULTS = snapshot(Day.default(0, None))
+
+
+def select_day(user_id: int, day_date: datetime.date) -> Select:
+    return select(Day).where(Day.user_id == user_id, Day.date == day_date)
+
+
+def select_range(user_id: int, start: datetime.date, end: datetime.date) -> Select:
+    return (
+        select(Day)
+        .where(Day.user_id == user_id, Day.date >= start, Day.date <= end)
+        .order_by(Day.date)
+    )
+
+
+def get(user_id: int, day_date: datetime.date) -> Day:
+    """Return the user's day, or an unsaved default one if there is none."""
+    day = db.session.scalar(select_day(user_id, day_date))
+    return day or Day.default(user_id, day_date)
+
+
+def save(day: Day, data: dict) -> Day:
+    """Save validated form data to a day along with its history and cycles.
+
+    The day is written by one upsert and its changes by one insert. Returns
+    the saved day, built from the written values instead of reading it back.
+    Saving an existing day without any change writes nothing.
+    """
+    changes = diff(snapshot(day), snapshot(data))
+    if not changes and day.id is not None:
+        return day
+    now = datetime.datetime.utcnow()
+    revision = next_revision(day.user_id)
+    values = _values(day.user_id, {**data, "date": day.date}, now, revision)
+    # read before the commit expires the day
+    created = day.created
+    day_id = _upsert_one(values)
+    if changes:
+        db.session.execute(
+            insert(DayHistory),
+            [
+                {
+                    "user_id": day.user_id,
+                    "date": day.date,
+                    "changes": changes,
+                    "created": now,
+                    "updated": now,
+                }
+            ],
+        )
+    cycles.refresh(day.user_id, revision, day.date)
+    db.session.commit()
+    values.update(id=day_id, created=created or now)
+    return Day(**values)
+
+
+def next_revision(user_id: int) -> int:
+    """Bump the revision of the user and return it, for the days being saved.
+
+    The update locks the user's row until the commit, so the saves of a user
+    commit in the order of their revisions, and a client syncing by revision
+    cannot miss a save committed after it looked.
+    """
+    stmt = update(User).where(User.id == user_id)
+    connection = db.session.connection()
+    if db.engine.dialect.name == "mysql":
+        # LAST_INSERT_ID(expr) reports the new revision as the insert id
+        stmt = stmt.values(revision=func.last_insert_id(User.revision + 1))
+        return connection.execute(stmt).lastrowid
+    stmt = stmt.values(revision=User.revision + 1).returning(User.revision)
+    return connection.execute(stmt).scalar_one()
+
+
+def _values(user_id: int, data: dict, now: datetime.datetime, revision: int) -> dict:
+    values = {field: data[field] for field in FIELDS}
+    values["day_count"] = int(values["day_count"])
+    values.update(Day.stamps(values))
+    values.update(
+        user_id=user_id,
+        date=data["date"],
+        created=now,
+        updated=now,
+        revision=revision,
+    )
+    return values
+
+
+def _upsert_statement(rows: Union[dict, list[dict]]) -> Insert:
+    updated = FIELDS + ("stamp", "peak_label", "updated", "revision")
+    if db.engine.dialect.name == "mysql":
+        stmt = mysql.insert(Day).values(rows)
+        return stmt.on_duplicate_key_update(
+            {c: stmt.inserted[c] for c in updated}
+            # LAST_INSERT_ID(id) reports the id of an updated row as well
+            | {"id": func.last_insert_id(Day.id)}
+        )
+    stmt = sqlite.insert(Day).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Day.user_id, Day.date],
+        set_={c: stmt.excluded[c] for c in updated},
+    )
+
+
+def _upsert(rows: list[dict]) -> None:
+    """Insert days, updating the ones that exist on unique_date_per_user_id."""
+    db.session.execute(_upsert_statement(rows))
+
+
+def _upsert_one(values: dict) -> int:
+    """Upsert a day, returning its id whether it was inserted or updated."""
+    stmt = _upsert_statement(values)
+    if db.engine.dialect.name == "mysql":
+        return db.session.connection().execute(stmt).lastrowid
+    return db.session.execute(stmt.returning(Day.id)).scalar_one()
+
+
+def select_stored(user_id: int, dates: list[datetime.date]) -> Select:
+    """Select the FIELDS of the stored days among ``dates``."""
+    return select(Day.date, *(getattr(Day, field) for field in FIELDS)).where(
+        Day.user_id == user_id, Day.date.in_(dates)
+    )
+
+
+def _stored(user_id: int, dates: list[datetime.date]) -> dict[datetime.date, dict]:
+    """Return the FIELDS of the stored days among ``dates``."""
+    stored = {}
+    for start in range(0, len(dates), BATCH_SIZE):
+        query = select_stored(user_id, dates[start : start + BATCH_SIZE])
+        for row in db.session.execute(query).mappings():
+            stored[row["date"]] = snapshot(dict(row))
+    return stored
+
+
+def save_many(user_id: int, data: list[dict]) -> None:
+    """Save validated form data of many days in one transaction.
+
+    Each item needs a ``date``, later items win over earlier ones with the
+    same date. Days are written by one upsert per batch and the changes of
+    their history by one bulk insert. Days saved without a change are left
+    out.
+    """
+    now = datetime.datetime.utcnow()
+    items = {item["date"]: item for item in data}
+    stored = _stored(user_id, list(items))
+    changed = []
+    history = []
+    for day_date, item in items.items():
+        changes = diff(stored.get(day_date, DEFAULTS), snapshot(item))
+        if not changes and day_date in stored:
+            continue
+        changed.append(item)
+        if changes:
+            history.append(
+                {
+                    "user_id": user_id,
+                    "date": day_date,
+                    "changes": changes,
+                    "created": now,
+                    "updated": now,
+                }
+            )
+    if not changed:
+        return
+    revision = next_revision(user_id)
+    rows = [_values(user_id, item, now, revision) for item in changed]
+    for start in range(0, len(rows), BATCH_SIZE):
+        _upsert(rows[start : start + BATCH_SIZE])
+    if history:
+        db.session.execute(insert(DayHistory), history)
+    dates = [row["date"] for row in rows]
+    cycles.refresh(user_id, revision, min(dates), max(dates))
+    db.session.commit()
+
+
+def select_history(user_id: int, day_date: datetime.date) -> Select:
+    return (
+        select(DayHistory)
+        .where(DayHistory.user_id == user_id, DayHistory.date == day_date)
+        .order_by(DayHistory.id)
+    )
+
+
+def versions(user_id: int, day_date: datetime.date) -> list[dict]:
+    """Rebuild every saved version of a day from its history, oldest first."""
+    state = dict(DEFAULTS)
+    result = []
+    history = db.session.scalars(select_history(user_id, day_date))
+    for number, entry in enumerate(history, start=1):
+        state.update(entry.changes)
+        result.append(
+            {
+                "version": number,
+                "updated": entry.updated.isoformat(),
+                "changes": entry.changes,
+                "day": {**state, "date": day_date.isoformat()},
+            }
+        )
+    return result
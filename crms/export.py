@@ -0,0 +1,216 @@
+import csv
+import datetime
+import json
+import zlib
+from io import StringIO
+from typing import Any, Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import Row, Select, SmallInteger, select, type_coerce
+
+from crms.models import Day, db
+from crms.rows import COLUMNS, DayRow, select_days
+from crms.vocabularies import VALUES, VOCABULARIES
+
+# Rows fetched per round trip from the server-side cursor and serialized
+# into a single chunk of the response body.
+CHUNK_SIZE = 500
+# rows of a row group of the Parquet export, they are buffered until written
+PARQUET_ROW_GROUP_SIZE = 50_000
+
+
+def select_codes(user_id: int) -> Select:
+    """Like ``select_days``, with the observations as their stored codes."""
+    return (
+        select(
+            *(
+                type_coerce(column, SmallInteger).label(column.key)
+                if column.key in VOCABULARIES
+                else column
+                for column in COLUMNS
+            )
+        )
+        .where(Day.user_id == user_id)
+        .order_by(Day.date)
+    )
+
+
+def stream_batches(query: Select) -> Iterator[Sequence[Row]]:
+    """Yield the rows of a query of days ordered by date, a batch at a time,
+    from a single server-side cursor."""
+    return db.session.execute(
+        query.execution_options(yield_per=CHUNK_SIZE)
+    ).partitions()
+
+
+def select_page(query: Select, after: Optional[datetime.date] = None) -> Select:
+    """Select the batch of a query of days ordered by date following ``after``."""
+    page = query.limit(CHUNK_SIZE)
+    if after is not None:
+        page = page.where(Day.date > after)
+    return page
+
+
+def page_batches(query: Select) -> Iterator[Sequence[Row]]:
+    """Yield the rows of a query of days ordered by date, a batch per query.
+
+    No statement stays open between batches, so the caller may commit in
+    between, e.g. to report progress.
+    """
+    last = None
+    while True:
+        rows = db.session.execute(select_page(query, last)).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1].date
+
+
+def json_chunks(batches: Iterable[Sequence[Row]]) -> Iterator[str]:
+    """Serialize batches of rows as a JSON array, one chunk per batch."""
+    yield "["
+    separator = ""
+    for rows in batches:
+        chunk = []
+        for row in rows:
+            chunk.append(separator + json.dumps(DayRow._make(row).to_dict()))
+            separator = ","
+        yield "".join(chunk)
+    yield "]"
+
+
+def csv_chunks(batches: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """Encode batches of rows as CSV, one chunk per batch."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(DayRow._fields)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Sink:
+    """Writable file collecting what pyarrow writes until it is taken."""
+
+    closed = False
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow  # pylint:disable=import-outside-toplevel
+        import pyarrow.parquet  # pylint:disable=import-outside-toplevel,unused-import
+    except ImportError as e:
+        raise RuntimeError("The Parquet export requires the pyarrow package") from e
+    return pyarrow
+
+
+def parquet_schema(pa: Any) -> Any:
+    """Observations are dictionary encoded by their vocabularies."""
+    types = {
+        "id": pa.int64(),
+        "peak": pa.bool_(),
+        "day_count": pa.int16(),
+        "intercourse": pa.bool_(),
+        "new_cycle": pa.bool_(),
+        "notes": pa.string(),
+        "date": pa.date32(),
+        "stamp": pa.string(),
+        "peak_label": pa.string(),
+    }
+    return pa.schema(
+        [
+            (name, types.get(name) or pa.dictionary(pa.int8(), pa.string()))
+            for name in DayRow._fields
+        ]
+    )
+
+
+def _table(pa: Any, schema: Any, rows: list[Row]) -> Any:
+    columns = []
+    for field, values in zip(schema, zip(*rows)):
+        if field.name in VOCABULARIES:
+            # codes are dense from 0, see crms.vocabularies
+            dictionary = VALUES[field.name]
+            columns.append(
+                pa.DictionaryArray.from_arrays(
+                    pa.array(values, pa.int8()),
+                    [dictionary[code] for code in range(len(dictionary))],
+                )
+            )
+        else:
+            columns.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def parquet_chunks(batches: Iterable[Sequence[Row]]) -> Iterator[bytes]:
+    """Encode batches of rows of ``select_codes`` as a Parquet file, one row
+    group of PARQUET_ROW_GROUP_SIZE rows at a time."""
+    pa = _pyarrow()
+    schema = parquet_schema(pa)
+    sink = _Sink()
+    with pa.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        group: list[Row] = []
+        for rows in batches:
+            group.extend(rows)
+            if len(group) >= PARQUET_ROW_GROUP_SIZE:
+                writer.write_table(_table(pa, schema, group))
+                group = []
+                yield sink.take()
+        if group:
+            writer.write_table(_table(pa, schema, group))
+    yield sink.take()
+
+
+def iter_json(user_id: int) -> Iterator[str]:
+    """Serialize the user's days as a JSON array without loading them all."""
+    return json_chunks(stream_batches(select_days(user_id)))
+
+
+def iter_csv(user_id: int) -> Iterator[bytes]:
+    """Encode the user's days as CSV without loading them all."""
+    return csv_chunks(stream_batches(select_days(user_id)))
+
+
+def iter_parquet(user_id: int) -> Iterator[bytes]:
+    """Encode the user's days as Parquet without loading them all.
+
+    Raises RuntimeError right away when pyarrow is not installed.
+    """
+    _pyarrow()
+    return parquet_chunks(stream_batches(select_codes(user_id)))
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress a stream of chunks into a single gzip member on the fly."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,241 @@
+"""Exports written to files in the background, gzipped unless Parquet.
+
+Requesting an export enqueues a job, which a thread pool of the requesting
+worker writes to ``EXPORT_DIR``, so no worker is held by the transfer. The
+state of jobs is kept in ``export_job``, any worker reports their progress
+and serves the finished files, with range requests. A finished export is
+reused as long as the revision of the user's days stays the same.
+"""
+import datetime
+import gzip
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional
+
+import structlog
+from flask import Flask, current_app, request
+from sqlalchemy import Select, delete, select, update
+from werkzeug.utils import send_file
+from werkzeug.wrappers import Response
+
+from crms import config, export
+from crms.conditional import select_revision
+from crms.models import Day, ExportJob, db
+from crms.rows import select_days
+
+logger = structlog.getLogger()
+
+FORMATS = ("json", "csv", "parquet")
+# formats compressed by themselves, the files of the others are gzipped
+COMPRESSED = ("parquet",)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Threads:
+    """The thread pool writing the exports of this process."""
+
+    def __init__(self) -> None:
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pid: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def get(self) -> ThreadPoolExecutor:
+        with self.lock:
+            # a pool created before a fork has no threads in the child
+            if self.executor is None or self.pid != os.getpid():
+                self.executor = ThreadPoolExecutor(
+                    config.EXPORT_THREADS, thread_name_prefix="crms-export"
+                )
+                self.pid = os.getpid()
+            return self.executor
+
+
+threads = Threads()
+
+
+def _submit(job_id: int) -> None:
+    # pylint:disable-next=protected-access
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+    threads.get().submit(run, app, job_id)
+
+
+def _suffix(export_format: str) -> str:
+    return export_format if export_format in COMPRESSED else f"{export_format}.gz"
+
+
+def path(job: ExportJob) -> Path:
+    return (
+        Path(config.EXPORT_DIR) / str(job.user_id) / f"{job.id}.{_suffix(job.format)}"
+    )
+
+
+def _stale_before() -> datetime.datetime:
+    """Unfinished jobs without progress since then are considered lost."""
+    return datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=config.EXPORT_STALE_AFTER
+    )
+
+
+def _reusable(job: ExportJob) -> bool:
+    if job.status == DONE:
+        return path(job).exists()
+    return job.status in (QUEUED, RUNNING) and job.updated >= _stale_before()
+
+
+def select_latest(user_id: int, export_format: str, revision: int) -> Select:
+    """Select the latest job that has not failed exporting the given revision."""
+    return (
+        select(ExportJob)
+        .where(
+            ExportJob.user_id == user_id,
+            ExportJob.format == export_format,
+            ExportJob.revision == revision,
+            ExportJob.status != FAILED,
+        )
+        .order_by(ExportJob.id.desc())
+        .limit(1)
+    )
+
+
+def enqueue(user_id: int, export_format: str) -> ExportJob:
+    """Return a job exporting the user's current days, starting one if needed."""
+    revision = db.session.scalar(select_revision(user_id))
+    job = db.session.scalar(select_latest(user_id, export_format, revision))
+    if job is not None and _reusable(job):
+        return job
+
+    job = ExportJob.create(
+        user_id=user_id,
+        format=export_format,
+        status=QUEUED,
+        revision=revision,
+        commit=True,
+    )
+    _submit(job.id)
+    return job
+
+
+def _chunks(job: ExportJob) -> Iterator[bytes]:
+    """Encode the days of the job, committing its progress after each batch."""
+
+    def batches(query: Select) -> Iterator:
+        done = 0
+        for rows in export.page_batches(query):
+            yield rows
+            done += len(rows)
+            db.session.execute(
+                update(ExportJob).where(ExportJob.id == job.id).values(rows=done)
+            )
+            db.session.commit()
+
+    if job.format == "parquet":
+        return export.parquet_chunks(batches(export.select_codes(job.user_id)))
+    if job.format == "json":
+        chunks = export.json_chunks(batches(select_days(job.user_id)))
+        return (chunk.encode() for chunk in chunks)
+    return export.csv_chunks(batches(select_days(job.user_id)))
+
+
+def _write(job: ExportJob) -> None:
+    job.status = RUNNING
+    job.total = db.session.scalar(
+        select(db.func.count()).select_from(Day).where(Day.user_id == job.user_id)
+    )
+    db.session.commit()
+
+    target = path(job)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}")
+    with (open if job.format in COMPRESSED else gzip.open)(tmp, "wb") as f:
+        for chunk in _chunks(job):
+            f.write(chunk)
+    os.replace(tmp, target)
+
+    job.status = DONE
+    job.size = target.stat().st_size
+    db.session.commit()
+    _remove_previous(job)
+
+
+def _remove_previous(job: ExportJob) -> None:
+    """Delete the earlier jobs of the same export and their files."""
+    previous = db.session.scalars(
+        select(ExportJob).where(
+            ExportJob.user_id == job.user_id,
+            ExportJob.format == job.format,
+            ExportJob.id < job.id,
+            ExportJob.status.in_((DONE, FAILED))
+            | (ExportJob.updated < _stale_before()),
+        )
+    ).all()
+    for old in previous:
+        path(old).unlink(missing_ok=True)
+    db.session.execute(
+        delete(ExportJob).where(ExportJob.id.in_([old.id for old in previous]))
+    )
+    db.session.commit()
+
+
+def run(app: Flask, job_id: int) -> None:
+    """Write the file of a job, run by the pool of the worker."""
+    with app.app_context():
+        job = db.session.get(ExportJob, job_id)
+        try:
+            _write(job)
+        except Exception as e:  # pylint:disable=broad-except
+            logger.exception("crms.export_failed", job_id=job_id)
+            db.session.rollback()
+            db.session.execute(
+                update(ExportJob)
+                .where(ExportJob.id == job_id)
+                .values(status=FAILED, error=str(e)[:512])
+            )
+            db.session.commit()
+        else:
+            logger.info(
+                "crms.export",
+                job_id=job_id,
+                format=job.format,
+                rows=job.rows,
+                size=job.size,
+            )
+
+
+def status(job: ExportJob) -> dict:
+    """Return the state of a job for its status endpoint."""
+    if job.status == DONE:
+        progress = 1.0
+    else:
+        progress = job.rows / job.total if job.total else 0.0
+    return {
+        "id": job.id,
+        "format": job.format,
+        "status": job.status,
+        "rows": job.rows,
+        "total": job.total,
+        "progress": round(progress, 3),
+        "size": job.size,
+        "error": job.error,
+    }
+
+
+def send(job: ExportJob) -> Response:
+    """Serve the file of a finished job, with range requests."""
+    return send_file(
+        path(job).resolve(),
+        request.environ,
+        mimetype=(
+            "application/vnd.apache.parquet"
+            if job.format == "parquet"
+            else "application/gzip"
+        ),
+        as_attachment=True,
+        download_name=f"crms.{_suffix(job.format)}",
+        use_x_sendfile=config.EXPORT_X_SENDFILE,
+    )
@@ -11,74 +11,17 @@ from wtforms import (
     validators,
 )
 
-from crms.models import User
-
-category = {
-    "red": "Menštruácia",
-    "green": "Sucho",
-    "gray": "Hlien",
-    "lightgreen": "Sucho po vrchole",
-    "yellow": "Nekvalitný hlien",
-    "gold": "Nekvalitný potencialne plodný hlien",
-}
-menstrual = {
-    "N/A": "Žiadne",
-    "H": "H - Veľmi silná",
-    "M": "M - Stredne silná",
-    "L": "L - Slabá",
-    "VL": "VL - Veľmi slabá",
-    "B": "B - Hnedá (čierna)",
-}
-indicator = {
-    "N/A": "Žiadne",
-    "0": "0 - Sucho",
-    "2": "2 - Vlhko bez klzkosti",
-    "2W": "2W - Mokro bez klzkosti",
-    "4": "4 - Lesk be klzkosti",
-    "6": "6 - Lepkavý (do 0.5cm)",
-    "8": "8 - Ťahavý (1 - 2 cm)",
-    "10": "10 - Elastický (>2.5 cm)",
-    "10DL": "10DL - Vlhko s klzkosťou",
-    "10SL": "10SL - Lesk s klzkosťou",
-    "10WL": "10WL - Mokro s klzkosťou",
-    "?X?": "?X? - Ani srnka netuší",
-}
-color = {
-    "N/A": "Žiadne",
-    "B": "B - Hnedé alebo čierne krvácanie",
-    "C": "C - Zakalený (alebo biely)",
-    "CK": "CK - Zakalený/číry",
-    "G": "G - Gumenný (ako lepidlo)",
-    "K": "K - Číry",
-    "L": "L - Klzký",
-    "P": "P - Pastovitý (alebo krémový)",
-    "Y": "Y - Žltý (aj slabožltý)",
-}
-sensation = {
-    "N/A": "Žiadne",
-    "L": "L - Klzký",
-    "G": "G - Gumenný (ako lepidlo)",
-    "P": "P - Pastovitý (alebo krémový)",
-}
-frequency = {
-    "N/A": "Žiadne",
-    "X1": "X1 - Raz za deň",
-    "X2": "X2 - Dva krát za deň",
-    "X3": "X3 - Tri krát za deň",
-    "AD": "AD - Po celý deň",
-}
-day_count = {
-    0: 0,
-    1: 1,
-    2: 2,
-    3: 3,
-}
-
-arrow = {
-    "": "Žiadne",
-    "up": "Šípka hore",
-    "down": "Šípka dole",
-}
+from crms.models import User, db
+from crms.vocabularies import (
+    arrow,
+    category,
+    color,
+    day_count,
+    frequency,
+    indicator,
+    menstrual,
+    sensation,
+)
 
 
 class RegistrationForm(Form):
@@ -110,17 +53,21 @@ class LoginForm(Form):
             validators.DataRequired(),
         ],
     )
+    # the user logging in once validated, so the view does not look them up
+    # again
+    user: Optional[User] = None
 
     def validate(self, extra_validators: Optional[list] = None) -> bool:
         if not super().validate():
             return False
-        user = User.query.filter_by(name=self.username.data).first()
+        user = db.session.scalar(User.select_by_name(self.username.data))
         if not user:
             self.username.errors.append("Užívateľ neexistuje")
             return False
         if not user.verify_password(self.password.data):
             self.password.errors.append("Zlé heslo")
             return False
+        self.user = user
         return True
 
 
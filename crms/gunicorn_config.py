@@ -0,0 +1,26 @@
+"""Gunicorn settings taken from ``crms.config``.
+
+Usage::
+
+    gunicorn -c python:crms.gunicorn_config "crms.app:create_app()"
+"""
+# gunicorn reads the names of this module as settings, one of them is config
+from crms import config as crms_config
+
+WORKER_CLASSES = ("sync", "gthread", "gevent")
+
+if crms_config.GUNICORN_WORKER_CLASS not in WORKER_CLASSES:
+    raise ValueError(
+        f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, "
+        f"not {crms_config.GUNICORN_WORKER_CLASS!r}"
+    )
+
+bind = crms_config.GUNICORN_BIND
+worker_class = crms_config.GUNICORN_WORKER_CLASS
+workers = crms_config.GUNICORN_WORKERS
+timeout = crms_config.GUNICORN_TIMEOUT
+if worker_class == "gevent":
+    worker_connections = crms_config.GUNICORN_THREADS
+else:
+    # gunicorn runs sync workers with more than one thread as gthread ones
+    threads = crms_config.GUNICORN_THREADS if worker_class == "gthread" else 1
@@ -0,0 +1,321 @@
+"""Retention of the day history.
+
+Old changes of a day are compacted into one change per period, the last
+one of the period, so every version at the end of a period can still be
+rebuilt. Changes older still are archived to gzipped JSON lines per user and
+replaced by a single change holding their result, from which the later
+versions are rebuilt. ``restore`` brings the archived changes back.
+
+Days are processed in batches, each committed on its own, so the commands
+never hold locks for long and can be interrupted and run again.
+
+Usage::
+
+    flask crms-history maintain
+    flask crms-history restore USERNAME
+"""
+import datetime
+import gzip
+import json
+import os
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Hashable, Iterator, Optional
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, select, update
+
+from crms import config, days
+from crms.models import DayHistory, User, db
+
+# days of history processed in one transaction
+BATCH_SIZE = 200
+
+PERIODS: dict[str, Callable[[datetime.datetime], Hashable]] = {
+    "day": lambda updated: updated.date(),
+    "week": lambda updated: updated.isocalendar()[:2],
+    "month": lambda updated: (updated.year, updated.month),
+}
+
+COLUMNS = (
+    DayHistory.id,
+    DayHistory.date,
+    DayHistory.changes,
+    DayHistory.created,
+    DayHistory.updated,
+)
+
+
+def _batches(
+    user_id: int, cutoff: datetime.datetime, batch_size: int
+) -> Iterator[dict[datetime.date, list]]:
+    """Yield changes older than ``cutoff`` grouped by day, a batch of days at
+    a time."""
+    last = None
+    while True:
+        query = (
+            select(DayHistory.date)
+            .where(
+                DayHistory.user_id == user_id,
+                DayHistory.updated < cutoff,
+                DayHistory.date.is_not(None),
+            )
+            .group_by(DayHistory.date)
+            .order_by(DayHistory.date)
+            .limit(batch_size)
+        )
+        if last is not None:
+            query = query.where(DayHistory.date > last)
+        dates = db.session.scalars(query).all()
+        if not dates:
+            return
+        last = dates[-1]
+        rows = db.session.execute(
+            select(*COLUMNS)
+            .where(
+                DayHistory.user_id == user_id,
+                DayHistory.date.in_(dates),
+                DayHistory.updated < cutoff,
+            )
+            .order_by(DayHistory.date, DayHistory.id)
+        ).all()
+        yield {
+            day_date: list(changes)
+            for day_date, changes in groupby(rows, key=lambda row: row.date)
+        }
+
+
+def _squash(
+    changes: list, key: Callable[[datetime.datetime], Hashable]
+) -> tuple[list[dict], list[int]]:
+    """Merge consecutive changes of a day with the same ``key`` of their time.
+
+    Returns the merged changes to update and the ids of the ones to delete.
+    The day's oldest changes must be among ``changes``, as the merged ones
+    leave out fields they set back to their previous values.
+    """
+    state = dict(days.DEFAULTS)
+    updates = []
+    deleted: list[int] = []
+    for _, group in groupby(changes, key=lambda row: key(row.updated)):
+        rows = list(group)
+        merged = {}
+        for row in rows:
+            merged.update(row.changes)
+        merged = {
+            field: value for field, value in merged.items() if state[field] != value
+        }
+        state.update(merged)
+        last = rows[-1]
+        deleted.extend(row.id for row in rows[:-1])
+        if not merged:
+            deleted.append(last.id)
+        elif merged != last.changes:
+            updates.append({"id": last.id, "changes": merged, "updated": last.updated})
+    return updates, deleted
+
+
+def _apply(updates: list[dict], deleted: list[int]) -> None:
+    if updates:
+        db.session.execute(update(DayHistory), updates)
+    if deleted:
+        db.session.execute(delete(DayHistory).where(DayHistory.id.in_(deleted)))
+    db.session.commit()
+
+
+def compact(
+    user_id: int,
+    cutoff: datetime.datetime,
+    period: str,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Merge changes older than ``cutoff`` into one per day and ``period``.
+
+    Returns the number of removed changes.
+    """
+    removed = 0
+    for batch in _batches(user_id, cutoff, batch_size):
+        updates = []
+        deleted = []
+        for changes in batch.values():
+            day_updates, day_deleted = _squash(changes, PERIODS[period])
+            updates.extend(day_updates)
+            deleted.extend(day_deleted)
+        _apply(updates, deleted)
+        removed += len(deleted)
+    return removed
+
+
+def archive_path(directory: str, user_id: int) -> Path:
+    return Path(directory) / f"user-{user_id}.jsonl.gz"
+
+
+def archive(
+    user_id: int,
+    cutoff: datetime.datetime,
+    directory: str,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Move changes older than ``cutoff`` to the archive of the user.
+
+    The changes of every day are replaced by one holding their result.
+    Returns the number of archived changes.
+    """
+    path = archive_path(directory, user_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    archived = 0
+    for batch in _batches(user_id, cutoff, batch_size):
+        # a single change is what archiving would leave in place of it
+        batch = {day_date: rows for day_date, rows in batch.items() if len(rows) > 1}
+        if not batch:
+            continue
+        # every batch is a gzip member of its own, appended to the file
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for day_date, changes in batch.items():
+                for row in changes:
+                    record = {
+                        "id": row.id,
+                        "user_id": user_id,
+                        "date": day_date.isoformat(),
+                        "changes": row.changes,
+                        "created": row.created.isoformat() if row.created else None,
+                        "updated": row.updated.isoformat(),
+                    }
+                    f.write(json.dumps(record) + "\n")
+        with open(path, "rb") as written:
+            os.fsync(written.fileno())
+
+        updates = []
+        deleted = []
+        for changes in batch.values():
+            day_updates, day_deleted = _squash(changes, lambda _: None)
+            updates.extend(day_updates)
+            deleted.extend(day_deleted)
+            archived += len(changes)
+        _apply(updates, deleted)
+    return archived
+
+
+def restore(user_id: int, directory: str, batch_size: int = BATCH_SIZE) -> int:
+    """Put the archived changes of a user back, returning their number.
+
+    Changes archived more than once were merged in between, the first
+    archived copy is the original one.
+    """
+    path = archive_path(directory, user_id)
+    records: dict[int, dict] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            records.setdefault(record["id"], record)
+
+    rows = [
+        {
+            "id": record["id"],
+            "user_id": user_id,
+            "date": datetime.date.fromisoformat(record["date"]),
+            "changes": record["changes"],
+            "created": record["created"]
+            and datetime.datetime.fromisoformat(record["created"]),
+            "updated": datetime.datetime.fromisoformat(record["updated"]),
+        }
+        for record in records.values()
+    ]
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        stored = set(
+            db.session.scalars(
+                select(DayHistory.id).where(
+                    DayHistory.id.in_([row["id"] for row in batch])
+                )
+            )
+        )
+        updates = [row for row in batch if row["id"] in stored]
+        if updates:
+            db.session.execute(update(DayHistory), updates)
+        inserts = [row for row in batch if row["id"] not in stored]
+        if inserts:
+            db.session.execute(insert(DayHistory), inserts)
+        db.session.commit()
+    path.rename(path.with_name(path.name + ".restored"))
+    return len(rows)
+
+
+def _cutoff(days_ago: int) -> datetime.datetime:
+    return datetime.datetime.utcnow() - datetime.timedelta(days=days_ago)
+
+
+def _user_ids(username: Optional[str]) -> list[int]:
+    query = select(User.id).order_by(User.id)
+    if username:
+        query = query.where(User.name == username)
+    return list(db.session.scalars(query))
+
+
+@click.group("crms-history")
+def history() -> None:
+    """Retention of the day history."""
+
+
+@history.command("compact")
+@click.option(
+    "--older-than",
+    default=config.HISTORY_COMPACT_AFTER_DAYS,
+    show_default=True,
+    help="Age in days.",
+)
+@click.option(
+    "--period",
+    type=click.Choice(list(PERIODS)),
+    default=config.HISTORY_COMPACT_PERIOD,
+    show_default=True,
+)
+@click.option("--user", "username", help="Only this user.")
+@with_appcontext
+def compact_command(older_than: int, period: str, username: Optional[str]) -> None:
+    """Keep one change per day and period of changes older than given days."""
+    for user_id in _user_ids(username):
+        removed = compact(user_id, _cutoff(older_than), period)
+        if removed:
+            click.echo(f"user {user_id}: {removed} changes compacted")
+
+
+@history.command("archive")
+@click.option(
+    "--older-than",
+    default=config.HISTORY_ARCHIVE_AFTER_DAYS,
+    show_default=True,
+    help="Age in days.",
+)
+@click.option("--directory", default=config.HISTORY_ARCHIVE_DIR, show_default=True)
+@click.option("--user", "username", help="Only this user.")
+@with_appcontext
+def archive_command(older_than: int, directory: str, username: Optional[str]) -> None:
+    """Move changes older than given days to gzipped JSON lines per user."""
+    for user_id in _user_ids(username):
+        archived = archive(user_id, _cutoff(older_than), directory)
+        if archived:
+            click.echo(f"user {user_id}: {archived} changes archived")
+
+
+@history.command("maintain")
+@click.pass_context
+def maintain(ctx: click.Context) -> None:
+    """Compact and archive the history by the configured ages."""
+    ctx.invoke(compact_command)
+    ctx.invoke(archive_command)
+
+
+@history.command("restore")
+@click.argument("username")
+@click.option("--directory", default=config.HISTORY_ARCHIVE_DIR, show_default=True)
+@with_appcontext
+def restore_command(username: str, directory: str) -> None:
+    """Put the archived changes of a user back into the history."""
+    user_ids = _user_ids(username)
+    if not user_ids:
+        raise click.ClickException(f"User {username} does not exist")
+    if not archive_path(directory, user_ids[0]).exists():
+        raise click.ClickException(f"User {username} has no archived history")
+    click.echo(f"{restore(user_ids[0], directory)} changes restored")
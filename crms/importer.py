@@ -0,0 +1,192 @@
+"""Import of the JSON and CSV files produced by the exports.
+
+Files are parsed as a stream and written in batches, so memory does not grow
+with their size. Every batch is committed on its own: when a row is invalid,
+the batches before it stay imported.
+"""
+import codecs
+import csv
+import datetime
+import gzip
+import io
+import json
+import time
+import zlib
+from typing import IO, Any, Iterable, Iterator, cast
+
+import click
+from flask.cli import with_appcontext
+
+from crms import days, forms
+from crms.models import Day, User
+
+# Rows written and committed together.
+BATCH_SIZE = 500
+
+CHOICES: dict[str, dict] = {
+    "category": forms.category,
+    "menstrual": forms.menstrual,
+    "indicator": forms.indicator,
+    "color": forms.color,
+    "sensation": forms.sensation,
+    "frequency": forms.frequency,
+    "day_count": forms.day_count,
+    "arrow": forms.arrow,
+}
+BOOLEANS = ("peak", "intercourse", "new_cycle")
+
+
+class InvalidRow(ValueError):
+    def __init__(self, row: int, message: str) -> None:
+        super().__init__(f"Row {row}: {message}")
+
+
+class ImportFailed(ValueError):
+    """An import stopped by an invalid row or file, after ``imported`` days
+    of the batches before it were committed."""
+
+    def __init__(self, imported: int, error: ValueError) -> None:
+        super().__init__(f"{error} ({imported} days before it were imported)")
+        self.imported = imported
+
+
+def iter_json(stream: IO[bytes], chunk_size: int = 64 * 1024) -> Iterator[dict]:
+    """Parse a JSON array of objects one object at a time."""
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += text.decode(chunk, final=not chunk)
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break  # the object continues in the next chunk
+            yield item
+        buffer = buffer[pos:]
+        if not chunk:
+            raise ValueError("Unexpected end of the JSON array")
+
+
+def iter_csv(stream: IO[bytes]) -> Iterator[dict]:
+    """Parse CSV rows into dicts typed like the JSON export."""
+    for row in csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline="")):
+        for field in BOOLEANS:
+            if field in row:
+                row[field] = row[field] == "True"
+        yield row
+
+
+def clean(number: int, item: dict, defaults: dict) -> dict:
+    """Validate an exported day against the choices of DayForm."""
+    if not isinstance(item, dict):
+        raise InvalidRow(number, "expected an object")
+    try:
+        day_date = datetime.date.fromisoformat(item.get("date") or "")
+    except (TypeError, ValueError) as e:
+        raise InvalidRow(number, f"invalid date {item.get('date')!r}") from e
+
+    data: dict[str, Any] = {"date": day_date}
+    for field, choices in CHOICES.items():
+        value = item.get(field)
+        if value is None or value == "":
+            value = defaults[field]
+        if field == "day_count":
+            value = int(value) if str(value).isdigit() else value
+        if value not in choices and value != defaults[field]:
+            raise InvalidRow(number, f"invalid {field} {value!r}")
+        data[field] = value
+    for field in BOOLEANS:
+        data[field] = bool(item.get(field))
+    data["notes"] = str(item.get("notes") or "")
+    if len(data["notes"]) > Day.notes.type.length:
+        raise InvalidRow(number, "notes are too long")
+    return data
+
+
+def run(
+    user_id: int, items: Iterable[dict], batch_size: int = BATCH_SIZE
+) -> tuple[int, float]:
+    """Import parsed days of a user, returning their count and the time taken.
+
+    Raises ImportFailed with the count of the days already imported when a
+    row or the file is invalid.
+    """
+    defaults = Day.default(user_id, None).to_dict()
+    started = time.perf_counter()
+    count = 0
+    imported = 0
+    batch = []
+    try:
+        for count, item in enumerate(items, start=1):
+            batch.append(clean(count, item, defaults))
+            if len(batch) >= batch_size:
+                days.save_many(user_id, batch)
+                imported = count
+                batch = []
+    except ValueError as e:
+        raise ImportFailed(imported, e) from e
+    if batch:
+        days.save_many(user_id, batch)
+    return count, max(time.perf_counter() - started, 1e-9)
+
+
+def _readable(items: Iterator[dict]) -> Iterator[dict]:
+    """Raise ValueError for corrupt files too, like for invalid ones."""
+    try:
+        yield from items
+    except (OSError, EOFError, zlib.error, csv.Error) as e:
+        raise ValueError(f"The file cannot be read: {e}") from e
+
+
+def parse(stream: IO[bytes], filename: str) -> Iterator[dict]:
+    """Parse an export, telling the format from the file name.
+
+    Gzip-compressed files are decompressed on the fly. Files that cannot be
+    read raise ValueError as they are iterated.
+    """
+    if filename.endswith(".gz"):
+        stream = cast(IO[bytes], gzip.GzipFile(fileobj=stream))
+        filename = filename[: -len(".gz")]
+    if filename.endswith(".csv"):
+        return _readable(iter_csv(stream))
+    if filename.endswith(".json"):
+        return _readable(iter_json(stream))
+    raise ValueError("Only .json, .csv and .csv.gz exports can be imported")
+
+
+@click.command("crms-import")
+@click.argument("username")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+@with_appcontext
+def import_file(username: str, path: str, batch_size: int) -> None:
+    """Import a JSON or CSV export into the days of a user."""
+    user = User.query.filter_by(name=username).first()
+    if not user:
+        raise click.ClickException(f"User {username} does not exist")
+    with open(path, "rb") as f:
+        try:
+            count, seconds = run(user.id, parse(f, path), batch_size)
+        except ValueError as e:
+            raise click.ClickException(str(e)) from e
+    click.echo(
+        f"Imported {count} days in {seconds:.2f} s ({count / seconds:.0f} rows/s)"
+    )
@@ -0,0 +1,85 @@
+"""Per-request timing of SQL statements and template rendering."""
+import time
+from typing import Any
+
+import jinja2
+import structlog
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from crms import config
+
+logger = structlog.getLogger()
+
+
+def _before_cursor_execute(conn: Any, *_: Any) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, _: Any, statement: str, *__: Any) -> None:
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    if has_request_context() and "request_start" in g:
+        g.sql_count += 1
+        g.sql_time += duration
+    if config.SLOW_QUERY_MS and duration * 1000 >= config.SLOW_QUERY_MS:
+        logger.warning(
+            "crms.slow_query",
+            statement=statement,
+            duration_ms=round(duration * 1000, 1),
+            path=request.path if has_request_context() else None,
+        )
+
+
+class TimedTemplate(jinja2.Template):
+    """Template adding the time it takes to render to the current request.
+
+    Used instead of Flask's template signals, which need blinker.
+    """
+
+    def render(self, *args: Any, **kwargs: Any) -> str:
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_request_context() and "request_start" in g:
+                g.template_time += time.perf_counter() - start
+
+
+def _start_request() -> None:
+    g.request_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+    g.template_time = 0.0
+
+
+def timings() -> dict:
+    """Return the timings of the current request so far, in milliseconds."""
+    if "request_start" not in g:
+        return {}
+    return {
+        "duration_ms": round((time.perf_counter() - g.request_start) * 1000, 1),
+        "sql_count": g.sql_count,
+        "sql_ms": round(g.sql_time * 1000, 1),
+        "template_ms": round(g.template_time * 1000, 1),
+    }
+
+
+def server_timing(values: dict) -> str:
+    """Format timings as a Server-Timing header shown by browser dev tools."""
+    return ", ".join(
+        [
+            f'db;dur={values["sql_ms"]};desc="{values["sql_count"]} queries"',
+            f'tpl;dur={values["template_ms"]};desc="templates"',
+            f'total;dur={values["duration_ms"]}',
+        ]
+    )
+
+
+def init_app(app: Flask) -> None:
+    # engines are created per application, so listen on all of them once
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(_start_request)
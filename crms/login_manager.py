@@ -1,11 +1,141 @@
-from flask_login import LoginManager
+"""Loading of the logged in user without a query on most requests.
 
-from crms.models import User
+The session only needs the id of the user, so it is loaded as a read-only
+``Principal`` kept for ``USER_CACHE_TTL`` seconds in a per-worker cache. The
+signed session cookie also carries a version of the user's password hash,
+taken at login: a session whose version no longer matches the user's is
+logged out. A change of the password or the API token drops the user from the
+cache of the worker making it, other workers notice once their entry expires.
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from flask import session
+from flask_login import LoginManager, login_user, logout_user
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import InstanceState
+
+from crms import config
+from crms.models import User, db
 
 login_manager = LoginManager()
 login_manager.login_view = "login"
 
+# session key of the version of the credentials the session was created with
+VERSION_KEY = "_user_version"
+
+
+def credentials_version(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()[:16]
+
+
+@dataclasses.dataclass(frozen=True)
+class Principal:
+    """The logged in user, as much of it as requests need."""
+
+    id: int
+    name: str
+    version: str
+    loaded: float = dataclasses.field(compare=False)
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def get_id(self) -> int:
+        return self.id
+
+
+class Principals:
+    """Least recently used principals of this process, expired by their age."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[int, Principal] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self.lock:
+            principal = self.entries.get(user_id)
+            if principal is None:
+                return None
+            if time.monotonic() - principal.loaded > self.ttl:
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return principal
+
+    def set(self, principal: Principal) -> None:
+        with self.lock:
+            self.entries[principal.id] = principal
+            self.entries.move_to_end(principal.id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id: int) -> None:
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+
+principals = Principals(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+
+
+def _fetch(user_id: int) -> Optional[Principal]:
+    row = db.session.execute(
+        select(User.id, User.name, User.password).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+    return _cache(row)
+
+
+def _cache(user: Any) -> Principal:
+    principal = Principal(
+        user.id, user.name, credentials_version(user.password), time.monotonic()
+    )
+    principals.set(principal)
+    return principal
+
 
 @login_manager.user_loader
-def load_user(user_id: int) -> User:
-    return User.query.get(user_id)
+def load_user(user_id: str) -> Optional[Principal]:
+    version = session.get(VERSION_KEY)
+    principal = principals.get(int(user_id))
+    if principal is None or principal.version != version:
+        principal = _fetch(int(user_id))
+    if principal is None:
+        return None
+    if version is None:
+        # sessions from before versions, and the ones restored from the
+        # remember cookie
+        session[VERSION_KEY] = principal.version
+    elif version != principal.version:
+        return None
+    return principal
+
+
+def login(user: User) -> None:
+    """Log the user in, remembering the version of their credentials."""
+    login_user(user, remember=True)
+    session[VERSION_KEY] = _cache(user).version
+
+
+def logout() -> None:
+    logout_user()
+    session.pop(VERSION_KEY, None)
+
+
+@event.listens_for(User, "after_update")
+def _credentials_changed(_: Any, __: Any, user: User) -> None:
+    state: InstanceState = inspect(user)
+    if any(
+        state.attrs[name].history.has_changes() for name in ("password", "api_token")
+    ):
+        principals.discard(user.id)
@@ -0,0 +1,327 @@
+"""Prometheus metrics shared by all gunicorn workers.
+
+Every worker keeps its metrics in memory and writes them to its own file in
+``METRICS_DIR`` at most once per ``FLUSH_INTERVAL``. ``/metrics`` adds up the
+files of all workers, so whichever worker serves the scrape reports the
+whole server. Counters and histograms of exited workers keep counting, gauges
+only count for running ones. The directory should be emptied on deploy.
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Union
+
+from flask import Flask, Response, g, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from crms import config
+from crms.models import db
+
+# seconds between writes of the metrics of a worker
+FLUSH_INTERVAL = 1.0
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1e4, 1e5, 1e6, 1e7, 1e8)
+
+Labels = tuple[str, ...]
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[Labels, Any] = {}
+        registry.append(self)
+
+    def _key(self, labels: dict) -> Labels:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def initial(self) -> Any:
+        return 0.0
+
+    def merge(self, total: Any, value: Any) -> Any:
+        return total + value
+
+    def samples(self, values: dict[Labels, Any]) -> Iterator[tuple[str, dict, Any]]:
+        for key, value in values.items():
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Gauge summed over the running workers."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Labels = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def initial(self) -> Any:
+        # counts of the buckets, not cumulative, then the sum
+        return [0] * len(self.buckets) + [0.0]
+
+    def merge(self, total: Any, value: Any) -> Any:
+        return [a + b for a, b in zip(total, value)]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with lock:
+            counts = self.values.setdefault(key, self.initial())
+            counts[next(i for i, le in enumerate(self.buckets) if value <= le)] += 1
+            counts[-1] += value
+
+    def samples(self, values: dict[Labels, Any]) -> Iterator[tuple[str, dict, Any]]:
+        for key, counts in values.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for le, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _number(le)}, cumulative
+            yield f"{self.name}_sum", labels, counts[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+
+registry: list[Metric] = []
+lock = threading.Lock()
+flush_lock = threading.Lock()
+
+REQUESTS = Counter(
+    "crms_requests_total",
+    "Requests by route, method and status code.",
+    ("endpoint", "method", "status"),
+)
+ERRORS = Counter(
+    "crms_request_errors_total",
+    "Requests answered with a server error, by route.",
+    ("endpoint",),
+)
+LATENCY = Histogram(
+    "crms_request_duration_seconds",
+    "Time to produce a response, without streaming its body, by route.",
+    ("endpoint", "method"),
+)
+POOL_CHECKED_OUT = Gauge("crms_db_pool_checked_out", "Database connections in use.")
+POOL_OVERFLOW = Gauge(
+    "crms_db_pool_overflow", "Database connections opened over the pool size."
+)
+POOL_WAIT = Histogram(
+    "crms_db_pool_wait_seconds", "Time waited for a database connection."
+)
+EXPORT_SIZE = Histogram(
+    "crms_export_size_bytes",
+    "Size of the streamed exports, by format.",
+    ("format",),
+    buckets=SIZE_BUCKETS,
+)
+FRAGMENT_LOOKUPS = Counter(
+    "crms_fragment_cache_lookups_total",
+    "Lookups of rendered fragments, by whether they were cached.",
+    ("result",),
+)
+
+
+class TimedQueuePool(QueuePool):
+    """Queue pool observing how long checkouts wait for a connection."""
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start)
+
+
+def count_bytes(chunks: Iterable[Union[str, bytes]], export_format: str) -> Iterator:
+    """Pass a streamed export through, observing its size at its end."""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+        yield chunk
+    EXPORT_SIZE.observe(size, format=export_format)
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _path(pid: int) -> Path:
+    return Path(config.METRICS_DIR) / f"{pid}.json"
+
+
+def _dump() -> dict:
+    with lock:
+        return {
+            metric.name: [[list(key), value] for key, value in metric.values.items()]
+            for metric in registry
+        }
+
+
+def flush() -> None:
+    """Write the metrics of this worker to its file."""
+    # threads of a worker flush at once, each through a temporary file of its
+    # own, and the latest dump is written last
+    with flush_lock:
+        path = _path(os.getpid())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(_dump()))
+        os.replace(tmp, path)
+
+
+def _load() -> None:
+    """Continue counting from the file of a previous worker with this pid."""
+    try:
+        stored = json.loads(_path(os.getpid()).read_text())
+    except (OSError, ValueError):
+        return
+    for metric in registry:
+        if metric.type != "gauge":
+            metric.values.update(
+                (tuple(key), value) for key, value in stored.get(metric.name, [])
+            )
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect() -> str:
+    """Render the metrics of all workers in the Prometheus text format."""
+    flush()
+    totals: dict[str, dict[Labels, Any]] = {metric.name: {} for metric in registry}
+    by_name = {metric.name: metric for metric in registry}
+    for path in Path(config.METRICS_DIR).glob("*.json"):
+        try:
+            stored = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        running = _is_running(int(path.stem))
+        for name, values in stored.items():
+            metric = by_name.get(name)
+            if metric is None or (metric.type == "gauge" and not running):
+                continue
+            for labels, value in values:
+                key = tuple(labels)
+                total = totals[name].get(key, metric.initial())
+                totals[name][key] = metric.merge(total, value)
+
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples(totals[metric.name]):
+            text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(
+                f"{name}{{{text}}} {_number(value)}"
+                if text
+                else f"{name} {_number(value)}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+class Flusher:
+    """Writes the metrics of this worker at most once per FLUSH_INTERVAL."""
+
+    def __init__(self) -> None:
+        self.last = 0.0
+        self.lock = threading.Lock()
+
+    def maybe_flush(self) -> None:
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last < FLUSH_INTERVAL:
+                return
+            if not self.last:
+                atexit.register(flush)
+            self.last = now
+        flush()
+
+
+flusher = Flusher()
+
+
+def _record(response: Response) -> Response:
+    endpoint = request.endpoint or "none"
+    if "request_start" in g:
+        LATENCY.observe(
+            time.perf_counter() - g.request_start,
+            endpoint=endpoint,
+            method=request.method,
+        )
+    REQUESTS.inc(
+        endpoint=endpoint, method=request.method, status=str(response.status_code)
+    )
+    if response.status_code >= 500:
+        ERRORS.inc(endpoint=endpoint)
+
+    pool = db.engine.pool
+    if isinstance(pool, QueuePool):
+        POOL_CHECKED_OUT.set(pool.checkedout())
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    flusher.maybe_flush()
+    return response
+
+
+def metrics() -> Response:
+    return Response(collect(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app: Flask) -> None:
+    """Record the requests of the app and serve them on ``/metrics``.
+
+    Has to be called before ``db.init_app``, it sets the pool of the engine.
+    """
+    uri: Optional[str] = app.config.get("SQLALCHEMY_DATABASE_URI")
+    if uri and make_url(uri).get_backend_name() != "sqlite":
+        options = app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+        options.setdefault("poolclass", TimedQueuePool)
+
+    _load()
+    app.after_request(_record)
+    app.add_url_rule("/metrics", "metrics", metrics)
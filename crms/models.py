@@ -1,15 +1,42 @@
 from __future__ import annotations
 
 import datetime
+import hashlib
+import secrets
 from typing import Any
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, Select, SmallInteger, UniqueConstraint, select
+from sqlalchemy.types import TypeDecorator
 from werkzeug.security import check_password_hash
 
+from crms.vocabularies import CODES, VALUES
+
 db = SQLAlchemy()
 
 
+class Code(TypeDecorator):  # pylint:disable=too-many-ancestors
+    """A value of a vocabulary, stored as its small integer code."""
+
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, vocabulary: str) -> None:
+        super().__init__()
+        self.vocabulary = vocabulary
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Any:
+        if value is None:
+            return None
+        try:
+            return CODES[self.vocabulary][value]
+        except KeyError as e:
+            raise ValueError(f"Invalid {self.vocabulary} {value!r}") from e
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        return None if value is None else VALUES[self.vocabulary][value]
+
+
 class BaseModel(db.Model):  # type: ignore
     __abstract__ = True
 
@@ -37,7 +64,10 @@ class User(BaseModel):  # type: ignore
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False, unique=True)
     password = db.Column(db.String(512), nullable=False)
-    api_token = db.Column(db.String(255))
+    # sha256 of the token, the token itself is only shown when issued
+    api_token = db.Column(db.String(255), index=True, unique=True)
+    # bumped by every save of the user's days, see crms.days.next_revision
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     days = db.relationship(
         "Day",
         backref=db.backref("day"),
@@ -48,6 +78,11 @@ class User(BaseModel):  # type: ignore
         backref=db.backref("day_history"),
         lazy="dynamic",
     )
+    cycles = db.relationship(
+        "Cycle",
+        backref=db.backref("cycle"),
+        lazy="dynamic",
+    )
 
     def is_active(self) -> bool:
         """True, as all users are active."""
@@ -68,59 +103,101 @@ class User(BaseModel):  # type: ignore
     def verify_password(self, password: str) -> bool:
         return check_password_hash(self.password, password)
 
+    @staticmethod
+    def hash_api_token(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def select_by_name(cls, name: str) -> Select:
+        return select(cls).where(cls.name == name)
+
+    @classmethod
+    def select_by_api_token(cls, token: str) -> Select:
+        return select(cls.id).where(cls.api_token == cls.hash_api_token(token))
+
+    def issue_api_token(self) -> str:
+        """Replace the API token of the user with a new one and return it."""
+        token = secrets.token_urlsafe(32)
+        self.api_token = self.hash_api_token(token)
+        return token
+
 
 class Day(BaseModel):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
         db.Integer, db.ForeignKey(User.id, ondelete="CASCADE"), nullable=False
     )
-    category = db.Column(db.String(32))
-    menstrual = db.Column(db.String(32))
-    indicator = db.Column(db.String(32))
-    color = db.Column(db.String(32))
-    sensation = db.Column(db.String(32))
-    frequency = db.Column(db.String(32))
+    category = db.Column(Code("category"))
+    menstrual = db.Column(Code("menstrual"))
+    indicator = db.Column(Code("indicator"))
+    color = db.Column(Code("color"))
+    sensation = db.Column(Code("sensation"))
+    frequency = db.Column(Code("frequency"))
     peak = db.Column(db.Boolean)
-    arrow = db.Column(db.String(32))
+    arrow = db.Column(Code("arrow"))
     day_count = db.Column(db.Integer)
     intercourse = db.Column(db.Boolean)
     notes = db.Column(db.String(512))
     date = db.Column(db.Date)
     new_cycle = db.Column(db.Boolean)
+    # format() and format_peak(), computed when the day is saved
+    stamp = db.Column(db.String(64))
+    peak_label = db.Column(db.String(8))
+    # the revision of the user the day was saved by last
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     __table_args__ = (
-        UniqueConstraint("date", "user_id", name="unique_date_per_user_id"),
+        UniqueConstraint("user_id", "date", name="unique_date_per_user_id"),
+        Index("ix_day_user_id_revision", "user_id", "revision"),
     )
 
-    def format(self) -> str:
-        menstrual = self.menstrual if self.menstrual != "N/A" else ""
-        observation = self.indicator if self.indicator != "N/A" else ""
-        observation += self.color if self.color != "N/A" else ""
-        observation += self.sensation if self.sensation != "N/A" else ""
+    @classmethod
+    def format_stamp(cls, values: dict) -> str:
+        """Return the observation written in the cell of a day in the overview."""
+        menstrual = values["menstrual"] if values["menstrual"] != "N/A" else ""
+        observation = values["indicator"] if values["indicator"] != "N/A" else ""
+        observation += values["color"] if values["color"] != "N/A" else ""
+        observation += values["sensation"] if values["sensation"] != "N/A" else ""
 
-        frequency = self.frequency if self.frequency != "N/A" else ""
+        frequency = values["frequency"] if values["frequency"] != "N/A" else ""
 
-        intercourse = "I" if self.intercourse else ""
+        intercourse = "I" if values["intercourse"] else ""
 
         res = menstrual
-        res = self.merge(res, observation, ";")
-        res = self.merge(res, frequency, "-")
-        res = self.merge(res, intercourse, " ")
+        res = cls.merge(res, observation, ";")
+        res = cls.merge(res, frequency, "-")
+        res = cls.merge(res, intercourse, " ")
 
         return res
 
-    def merge(self, s1: str, s2: str, sep: str) -> str:
+    @staticmethod
+    def merge(s1: str, s2: str, sep: str) -> str:
         if s1 and s2:
             return s1 + sep + s2
         return s1 or s2
 
-    def format_peak(self) -> str:
-        if self.peak:
+    @staticmethod
+    def format_peak_label(values: dict) -> str:
+        if values["peak"]:
             return "P"
-        if self.day_count:
-            return str(self.day_count)
+        if values["day_count"] and int(values["day_count"]):
+            return str(int(values["day_count"]))
         return ""
 
+    @classmethod
+    def stamps(cls, values: dict) -> dict:
+        """Return the stamp and peak label of a day, stored along with it."""
+        return {
+            "stamp": cls.format_stamp(values),
+            "peak_label": cls.format_peak_label(values),
+        }
+
+    def format(self) -> str:
+        return self.format_stamp(self.to_dict())
+
+    def format_peak(self) -> str:
+        return self.format_peak_label(self.to_dict())
+
     def is_today(self) -> bool:
         return self.date == datetime.date.today()
 
@@ -137,6 +214,8 @@ class Day(BaseModel):
         self.intercourse = form["intercourse"]
         self.new_cycle = form["new_cycle"]
         self.notes = form["notes"]
+        self.stamp = self.format_stamp(form)
+        self.peak_label = self.format_peak_label(form)
 
     def to_dict(self) -> dict:
         return {
@@ -154,6 +233,8 @@ class Day(BaseModel):
             "new_cycle": self.new_cycle,
             "notes": self.notes,
             "date": self.date.isoformat() if self.date else None,
+            "stamp": self.stamp,
+            "peak_label": self.peak_label,
         }
 
     @classmethod
@@ -173,43 +254,67 @@ class Day(BaseModel):
             new_cycle=False,
             notes="",
             date=day_date,
+            stamp="",
+            peak_label="",
         )
 
 
 class DayHistory(BaseModel):
+    """A change of a day, holding only the fields that changed by it.
+
+    A version of a day is rebuilt by applying its changes in the order of
+    ``id`` to the default day, see ``crms.days.versions``.
+    """
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
         db.Integer, db.ForeignKey(User.id, ondelete="CASCADE"), nullable=False
     )
-    category = db.Column(db.String(32))
-    menstrual = db.Column(db.String(32))
-    indicator = db.Column(db.String(32))
-    color = db.Column(db.String(32))
-    sensation = db.Column(db.String(32))
-    frequency = db.Column(db.String(32))
-    peak = db.Column(db.Boolean)
-    day_count = db.Column(db.Integer)
-    arrow = db.Column(db.String(32))
-    intercourse = db.Column(db.Boolean)
-    notes = db.Column(db.String(512))
     date = db.Column(db.Date)
-    new_cycle = db.Column(db.Boolean)
+    changes = db.Column(db.JSON, nullable=False)
 
-    @classmethod
-    def from_day(cls, day: Day) -> DayHistory:
-        return cls(
-            user_id=day.user_id,
-            category=day.category,
-            menstrual=day.menstrual,
-            indicator=day.indicator,
-            color=day.color,
-            sensation=day.sensation,
-            frequency=day.frequency,
-            peak=day.peak,
-            day_count=day.day_count,
-            arrow=day.arrow,
-            intercourse=day.intercourse,
-            notes=day.notes,
-            date=day.date,
-            new_cycle=day.new_cycle,
-        )
+    __table_args__ = (Index("ix_day_history_user_id_date", "user_id", "date"),)
+
+
+class Cycle(BaseModel):
+    """A cycle of a user's days, maintained from ``Day.new_cycle`` on save."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey(User.id, ondelete="CASCADE"), nullable=False
+    )
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+    peak_date = db.Column(db.Date)
+    # number of days with an observation, gaps excluded
+    recorded_days = db.Column(db.Integer, nullable=False)
+    # the revision of the user the cycle changed at last, keys its rendering
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "start_date", name="unique_start_per_user_id"),
+    )
+
+
+class ExportJob(BaseModel):
+    """An export of a user's days to a gzipped file, see crms.export_jobs."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey(User.id, ondelete="CASCADE"), nullable=False
+    )
+    # "json", "csv" or "parquet"
+    format = db.Column(db.String(8), nullable=False)
+    # "queued", "running", "done" or "failed"
+    status = db.Column(db.String(16), nullable=False)
+    # the revision of the user when the export was requested, an export is
+    # reused while it stays the same
+    revision = db.Column(db.Integer)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    # bytes of the finished file
+    size = db.Column(db.Integer)
+    error = db.Column(db.String(512))
+
+    __table_args__ = (Index("ix_export_job_user_id_format", "user_id", "format"),)
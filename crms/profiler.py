@@ -0,0 +1,172 @@
+"""Profiling of single requests, meant to stay enabled in production.
+
+A request is profiled when it carries a valid profiling token in the
+``X-Crms-Profile`` header or the ``profile`` query argument, or when it is
+picked by ``PROFILE_SAMPLE_RATE``. Its cProfile stats are written to
+``PROFILE_DIR`` and can be read by ``python -m pstats`` or snakeviz, only the
+latest ``PROFILE_MAX_FILES`` are kept. Other requests only pay for a header
+lookup and a random number.
+
+Usage::
+
+    flask crms-profile-token
+    curl -H "X-Crms-Profile: <token>" https://.../overview
+"""
+import cProfile
+import datetime
+import glob
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+import click
+import structlog
+from flask import Flask, Response, request
+from flask.cli import with_appcontext
+from flask_login import current_user
+from itsdangerous import BadSignature, TimestampSigner
+
+from crms import config
+
+logger = structlog.getLogger()
+
+HEADER = "HTTP_X_CRMS_PROFILE"
+ARGUMENT = "profile"
+# environ key of the details of a profiled request, filled in by the app
+ENVIRON_KEY = "crms.profile"
+# seconds a profiling token is valid
+TOKEN_MAX_AGE = 24 * 60 * 60
+
+signer = TimestampSigner(config.SECRET_KEY, salt="crms-profile")
+
+
+def issue_token() -> str:
+    return signer.sign("profile").decode()
+
+
+def _token(environ: dict) -> Optional[str]:
+    token = environ.get(HEADER)
+    if token:
+        return token
+    query = environ.get("QUERY_STRING", "")
+    if f"{ARGUMENT}=" in query:
+        match = re.search(rf"(?:^|&){ARGUMENT}=([^&]+)", query)
+        return match.group(1) if match else None
+    return None
+
+
+def _is_valid(token: str) -> bool:
+    try:
+        signer.unsign(token, max_age=TOKEN_MAX_AGE)
+    except BadSignature:
+        return False
+    return True
+
+
+class ProfilerMiddleware:
+    """WSGI middleware profiling the requests that ask for it or are sampled."""
+
+    def __init__(
+        self,
+        wsgi_app: Callable,
+        directory: str,
+        sample_rate: float = 0.0,
+        max_files: int = 1000,
+    ) -> None:
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        # cProfile cannot profile two requests of one process at once
+        self.lock = threading.Lock()
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        token = _token(environ)
+        sampled = self.sample_rate and random.random() < self.sample_rate
+        if not (sampled or (token and _is_valid(token))):
+            return self.wsgi_app(environ, start_response)
+        if self.lock.locked():
+            # another request of this process is being profiled, the rare one
+            # that passes at the same time waits for it below
+            return self.wsgi_app(environ, start_response)
+        with self.lock:
+            return self._profile(environ, start_response)
+
+    def _profile(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        details: dict[str, Any] = {}
+        environ[ENVIRON_KEY] = details
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            # the body is read here, so that streamed responses are profiled too
+            response = self.wsgi_app(environ, start_response)
+            try:
+                body = list(response)
+            finally:
+                if hasattr(response, "close"):
+                    response.close()
+        finally:
+            profile.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = "-".join(
+            [
+                datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S.%f"),
+                details.get("endpoint") or "none",
+                f"user{details.get('user_id') or 0}",
+                f"{duration_ms:.0f}ms",
+            ]
+        )
+        path = os.path.join(self.directory, f"{name}.prof")
+        profile.dump_stats(path)
+        self._rotate()
+        logger.info(
+            "crms.profile",
+            path=environ.get("PATH_INFO"),
+            file=path,
+            duration_ms=round(duration_ms, 1),
+            **details,
+        )
+        return body
+
+    def _rotate(self) -> None:
+        """Delete the oldest profiles over ``max_files``."""
+        # names start with the time of the request
+        profiles = sorted(glob.glob(os.path.join(self.directory, "*.prof")))
+        for path in profiles[: max(len(profiles) - self.max_files, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # deleted by another worker
+                pass
+
+
+def _tag(response: Response) -> Response:
+    details = request.environ.get(ENVIRON_KEY)
+    if details is not None:
+        details["endpoint"] = request.endpoint
+        if current_user.is_authenticated:
+            details["user_id"] = current_user.id
+    return response
+
+
+def init_app(app: Flask) -> None:
+    app.wsgi_app = ProfilerMiddleware(  # type: ignore[assignment]
+        app.wsgi_app,
+        config.PROFILE_DIR,
+        config.PROFILE_SAMPLE_RATE,
+        config.PROFILE_MAX_FILES,
+    )
+    app.after_request(_tag)
+
+
+@click.command("crms-profile-token")
+@with_appcontext
+def profile_token() -> None:
+    """Issue a token profiling the requests that carry it for a day."""
+    click.echo(issue_token())
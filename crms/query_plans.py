@@ -0,0 +1,102 @@
+"""Check that the queries behind each view are served by an index.
+
+``tests/test_query_plans.py`` explains them against SQLite. The command
+explains them against an in-memory SQLite database created from the models,
+and also against ``DATABASE_URL`` when it points to MySQL, exiting with an
+error when any of them falls back to a full scan::
+
+    flask crms-check-query-plans
+"""
+import datetime
+from typing import Iterator
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Connection, create_engine
+from sqlalchemy.sql import Select
+
+from crms import api, config, cycles, days, export, export_jobs
+from crms.conditional import select_revision
+from crms.models import User, db
+from crms.rows import select_days
+
+USER_ID = 1
+DAY = datetime.date(2023, 5, 7)
+
+
+def queries() -> Iterator[tuple[str, Select]]:
+    """Yield the hot queries of the views with representative parameters.
+
+    They are built by the same functions the views use.
+    """
+    later = DAY + datetime.timedelta(days=1)
+    yield "login", User.select_by_name("user")
+    yield "api token", User.select_by_api_token("token")
+    yield "index", days.select_day(USER_ID, DAY)
+    yield "revision", select_revision(USER_ID)
+    yield "overview: cycles", cycles.select_page(USER_ID, config.OVERVIEW_CYCLES, DAY)
+    yield "overview: days", cycles.select_between(USER_ID, DAY, later)
+    yield "save: cycle bounds", cycles.select_bounds(USER_ID, DAY, DAY)
+    yield "save: stored days", days.select_stored(USER_ID, [DAY, later])
+    yield "api: days", days.select_range(USER_ID, DAY, later)
+    yield "sync", api.select_changes(USER_ID, (7, 1))
+    yield "export", select_days(USER_ID)
+    yield "export: page", export.select_page(export.select_codes(USER_ID), DAY)
+    yield "history", days.select_history(USER_ID, DAY)
+    yield "export job", export_jobs.select_latest(USER_ID, "json", 7)
+
+
+def explain(connection: Connection, query: Select) -> tuple[list[str], bool]:
+    """Return the plan of a query and whether it scans a whole table."""
+    compiled = query.compile(
+        dialect=connection.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if connection.dialect.name == "sqlite":
+        details = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + str(compiled), params
+        ).mappings()
+        plan = [row["detail"] for row in details]
+        # selects of scalar subqueries only scan their one constant row
+        return plan, any(
+            step.startswith("SCAN") and step != "SCAN CONSTANT ROW" for step in plan
+        )
+
+    rows = connection.exec_driver_sql("EXPLAIN " + str(compiled), params).all()
+    plan = [f"{row.table}: {row.type} using {row.key}" for row in rows]
+    # "ALL" reads the whole table, "index" the whole of an index
+    return plan, any(row.type in ("ALL", "index") for row in rows)
+
+
+def check(connection: Connection) -> int:
+    failures = 0
+    for name, query in queries():
+        plan, full_scan = explain(connection, query)
+        failures += full_scan
+        status = click.style("FULL SCAN", fg="red") if full_scan else "ok"
+        click.echo(f"  {name}: {status}")
+        for step in plan:
+            click.echo(f"      {step}")
+    return failures
+
+
+@click.command("crms-check-query-plans")
+@with_appcontext
+def check_query_plans() -> None:
+    """Fail if a query behind a view is not served by an index."""
+    engine = create_engine("sqlite://")
+    db.metadata.create_all(engine)
+    click.echo("sqlite")
+    with engine.connect() as connection:
+        failures = check(connection)
+
+    if db.engine.dialect.name == "mysql":
+        click.echo("mysql")
+        with db.engine.connect() as connection:
+            failures += check(connection)
+
+    if failures:
+        raise click.ClickException(f"{failures} queries fall back to a full scan")
@@ -0,0 +1,136 @@
+"""Synthetic observation histories for development and benchmarks.
+
+Cycles are 25 to 35 days long: menstruation, dry days, days of mucus
+building up to the peak, three counted days after it and dry days again.
+Some days stay unrecorded and some are edited again later, which adds to
+their history. The same seed always produces the same histories.
+
+Usage::
+
+    flask crms-seed --users 10 --years 5
+"""
+import datetime
+import random
+from typing import Iterator
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+from crms import days
+from crms.models import User
+
+# share of days without an observation
+SKIPPED = 0.05
+
+
+def _observation(rng: random.Random, day: int, peak: int, menses: int) -> dict:
+    data = {
+        "category": "green",
+        "menstrual": "N/A",
+        "indicator": "0",
+        "color": "N/A",
+        "sensation": "N/A",
+        "frequency": "AD",
+        "peak": False,
+        "day_count": 0,
+        "arrow": "",
+        "intercourse": rng.random() < 0.15,
+        "new_cycle": day == 0,
+        "notes": "",
+    }
+    mucus = peak - rng.randint(3, 6)
+    if day < menses:
+        data.update(
+            category="red",
+            menstrual="H" if day < 2 else rng.choice(["M", "L", "VL"]),
+            indicator="N/A",
+            intercourse=False,
+        )
+    elif mucus <= day < peak:
+        data.update(
+            category=rng.choice(["gray", "gray", "yellow"]),
+            indicator=rng.choice(["6", "8", "10"]),
+            color=rng.choice(["C", "CK", "P"]),
+            frequency=rng.choice(["X1", "X2", "X3"]),
+        )
+    elif day == peak:
+        data.update(
+            category="gray",
+            indicator="10",
+            color="K",
+            sensation="L",
+            frequency="X3",
+            peak=True,
+        )
+    elif peak < day <= peak + 3:
+        data.update(category="lightgreen", day_count=day - peak)
+    if rng.random() < 0.05:
+        data["notes"] = rng.choice(["Stres", "Choroba", "Cestovanie", "Lieky"])
+    return data
+
+
+def history(
+    rng: random.Random, start: datetime.date, end: datetime.date
+) -> Iterator[dict]:
+    """Generate observations of the days from ``start`` to ``end``."""
+    cycle_start = start
+    while cycle_start <= end:
+        length = rng.randint(25, 35)
+        peak = length - rng.randint(11, 15)
+        menses = rng.randint(4, 6)
+        for day in range(length):
+            day_date = cycle_start + datetime.timedelta(days=day)
+            if day_date > end:
+                return
+            # the first day of a cycle is always recorded, it starts the cycle
+            if day and rng.random() < SKIPPED:
+                continue
+            yield {**_observation(rng, day, peak, menses), "date": day_date}
+        cycle_start += datetime.timedelta(days=length)
+
+
+def seed_user(
+    user_id: int, years: float, rng: random.Random, churn: float = 0.1
+) -> int:
+    """Save ``years`` of observations up to today, returning their count.
+
+    A ``churn`` share of the days is saved once more with changed notes.
+    """
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=round(years * 365))
+    observations = list(history(rng, start, end))
+    days.save_many(user_id, observations)
+    edited = [
+        {**data, "notes": "Opravené"} for data in observations if rng.random() < churn
+    ]
+    days.save_many(user_id, edited)
+    return len(observations)
+
+
+@click.command("crms-seed")
+@click.option("--users", default=1, show_default=True)
+@click.option("--years", default=1.0, show_default=True)
+@click.option(
+    "--churn", default=0.1, show_default=True, help="Share of re-edited days."
+)
+@click.option("--seed", default=0, show_default=True, help="Seed of the generator.")
+@click.option(
+    "--prefix", default="seed", show_default=True, help="Prefix of user names."
+)
+@click.option("--password", default="seed-password", show_default=True)
+@with_appcontext
+def seed_users(
+    users: int, years: float, churn: float, seed: int, prefix: str, password: str
+) -> None:
+    """Create users with synthetic histories of observations."""
+    rng = random.Random(seed)
+    for number in range(users):
+        name = f"{prefix}{number}"
+        if User.query.filter_by(name=name).first():
+            raise click.ClickException(f"User {name} already exists")
+        user = User.create(
+            name=name, password=generate_password_hash(password), commit=True
+        )
+        count = seed_user(user.id, years, rng, churn)
+        click.echo(f"{name}: {count} days")
@@ -0,0 +1,143 @@
+"""Maintenance of the stamps and peak labels stored with days.
+
+``Day.stamp`` and ``Day.peak_label`` are computed when a day is saved, so
+the overview does not format every cell on every view. These commands
+compute them for days saved before, and check the stored ones.
+
+Changed stamps bump the revision of their user like a save does, so that
+ETags, syncing clients and the cached rows of the overview see them.
+"""
+from collections import defaultdict
+from typing import Iterator, Sequence
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Row, select, update
+
+from crms.days import FIELDS, next_revision
+from crms.models import Cycle, Day, db
+
+# days read and updated at once
+BATCH_SIZE = 1000
+
+
+def _batches(only_missing: bool) -> Iterator[Sequence[Row]]:
+    columns = [getattr(Day, field) for field in FIELDS]
+    query = (
+        select(
+            Day.id,
+            Day.user_id,
+            Day.date,
+            Day.updated,
+            Day.stamp,
+            Day.peak_label,
+            *columns,
+        )
+        .order_by(Day.id)
+        .limit(BATCH_SIZE)
+    )
+    if only_missing:
+        query = query.where(Day.stamp.is_(None))
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(Day.id > last_id)).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+
+
+def outdated(only_missing: bool = False) -> Iterator[dict]:
+    """Yield the days whose stored stamps differ from the computed ones."""
+    for rows in _batches(only_missing):
+        for row in rows:
+            stamps = Day.stamps(row._asdict())
+            if stamps != {"stamp": row.stamp, "peak_label": row.peak_label}:
+                yield {
+                    "id": row.id,
+                    "user_id": row.user_id,
+                    "date": row.date,
+                    "updated": row.updated,
+                    **stamps,
+                }
+
+
+def _save(days: list[dict]) -> None:
+    """Store the stamps of days at a new revision of each of their users,
+    which their cycles between the first and the last day take too."""
+    if not days:
+        return
+    by_user = defaultdict(list)
+    for day in days:
+        by_user[day["user_id"]].append(day)
+    for user_id, changed in sorted(by_user.items()):
+        revision = next_revision(user_id)
+        dates = [day["date"] for day in changed]
+        db.session.execute(
+            update(Cycle)
+            .where(
+                Cycle.user_id == user_id,
+                Cycle.start_date <= max(dates),
+                Cycle.end_date >= min(dates),
+            )
+            .values(revision=revision)
+        )
+        db.session.execute(
+            update(Day),
+            [
+                {
+                    "id": day["id"],
+                    # the stamps are not a change of the day
+                    "updated": day["updated"],
+                    "stamp": day["stamp"],
+                    "peak_label": day["peak_label"],
+                    "revision": revision,
+                }
+                for day in changed
+            ],
+        )
+    db.session.commit()
+
+
+def refresh(only_missing: bool) -> int:
+    """Store the computed stamps of days, returning how many changed."""
+    count = 0
+    batch = []
+    for day in outdated(only_missing):
+        batch.append(day)
+        if len(batch) >= BATCH_SIZE:
+            _save(batch)
+            count += len(batch)
+            batch = []
+    _save(batch)
+    return count + len(batch)
+
+
+@click.command("crms-backfill-stamps")
+@click.option("--all", "refresh_all", is_flag=True, help="Recompute all days.")
+@with_appcontext
+def backfill(refresh_all: bool) -> None:
+    """Store stamps of days saved without them.
+
+    By default only days without a stamp are processed, so it is cheap to run
+    on every deploy.
+    """
+    count = refresh(only_missing=not refresh_all)
+    if count:
+        click.echo(f"{count} days updated")
+
+
+@click.command("crms-check-stamps")
+@with_appcontext
+def check() -> None:
+    """Recompute the stamps of all days and compare them with the stored ones."""
+    count = 0
+    for day in outdated():
+        count += 1
+        if count <= 10:
+            click.echo(f"day {day['id']}: {day['stamp']!r} {day['peak_label']!r}")
+    if count:
+        raise click.ClickException(
+            f"{count} days have outdated stamps, run crms-backfill-stamps --all"
+        )
+    click.echo("All stamps are up to date")
@@ -41,6 +41,22 @@ if ('serviceWorker' in navigator) {
       console.log('ServiceWorker registration failed: ', err);
     });
   });
+  // replay edits queued while offline and drop outdated pages
+  window.addEventListener('online', function() {
+    if (navigator.serviceWorker.controller) {
+      navigator.serviceWorker.controller.postMessage('sync');
+    }
+  });
+  // edits queued offline that the server refused to save
+  navigator.serviceWorker.addEventListener('message', function(event) {
+    if (event.data && event.data.type === 'rejected') {
+      var alert = document.createElement('div');
+      alert.className = 'container alert alert-danger';
+      alert.textContent = 'Záznamy z dní ' + event.data.dates.join(', ') +
+        ' uložené offline sú neplatné. Opravte ich a uložte znova.';
+      document.body.insertBefore(alert, document.body.querySelector('.navbar').nextSibling);
+    }
+  });
 }
 let deferredPrompt;
 const addBtn = document.querySelector('#install-button');
@@ -1,13 +1,212 @@
+var CACHE = 'crms-pages';
+var DB_NAME = 'crms-sync';
+var EDITS = 'edits';
+var STATE = 'state';
+var BOOLEANS = ['peak', 'intercourse', 'new_cycle'];
+
+function openDb() {
+  return new Promise(function(resolve, reject) {
+    var request = indexedDB.open(DB_NAME, 1);
+    request.onupgradeneeded = function() {
+      // edits are keyed by their date, a later edit of a day replaces the queued one
+      request.result.createObjectStore(EDITS, {keyPath: 'date'});
+      request.result.createObjectStore(STATE);
+    };
+    request.onsuccess = function() { resolve(request.result); };
+    request.onerror = function() { reject(request.error); };
+  });
+}
+
+function withStore(name, mode, callback) {
+  return openDb().then(function(db) {
+    return new Promise(function(resolve, reject) {
+      var transaction = db.transaction(name, mode);
+      var request = callback(transaction.objectStore(name));
+      transaction.oncomplete = function() { resolve(request && request.result); };
+      transaction.onerror = function() { reject(transaction.error); };
+    });
+  });
+}
+
+function localDate(date) {
+  var month = String(date.getMonth() + 1).padStart(2, '0');
+  var day = String(date.getDate()).padStart(2, '0');
+  return date.getFullYear() + '-' + month + '-' + day;
+}
+
+function queueEdit(request) {
+  var url = new URL(request.url);
+  return request.formData().then(function(form) {
+    var day = {};
+    form.forEach(function(value, key) { day[key] = value; });
+    BOOLEANS.forEach(function(key) { day[key] = key in day; });
+    day.date = url.searchParams.get('day') || localDate(new Date());
+    day.updated = new Date().toISOString();
+    return withStore(EDITS, 'readwrite', function(store) { return store.put(day); });
+  }).then(function() {
+    if (self.registration.sync) {
+      return self.registration.sync.register('crms-sync');
+    }
+  });
+}
+
+function offlineResponse(request) {
+  var body = '<!doctype html><meta name="viewport" content="width=device-width, initial-scale=1">' +
+    '<p>Ste offline. Záznam sa uloží po pripojení.</p><a href="' + request.url + '">Späť</a>';
+  return new Response(body, {headers: {'Content-Type': 'text/html; charset=utf-8'}});
+}
+
+// Resolve to the page of changes after a cursor, or to null when the server
+// does not know the cursor any more.
+function changes(cursor) {
+  return fetch('/api/v1/sync?cursor=' + encodeURIComponent(cursor), {credentials: 'same-origin'})
+    .then(function(response) {
+      if (response.status === 400) {
+        return null;
+      }
+      if (!response.ok) {
+        throw new Error('Sync failed with ' + response.status);
+      }
+      return response.json();
+    });
+}
+
+// Drop cached pages showing days that changed on the server.
+function pull() {
+  return withStore(STATE, 'readonly', function(store) { return store.get('cursor'); })
+    .then(function(cursor) { return cursor ? changes(cursor) : null; })
+    .then(function(page) {
+      if (page) {
+        return page;
+      }
+      // nothing was synced yet, or with a cursor of an older version: drop
+      // every cached page and start from the latest change
+      return caches.delete(CACHE).then(function() { return changes('head'); });
+    })
+    .then(function(page) {
+      var dates = page.days.map(function(day) { return day.date; });
+      return caches.open(CACHE)
+        .then(function(cache) {
+          if (!dates.length) {
+            return;
+          }
+          return cache.keys().then(function(requests) {
+            return Promise.all(requests.filter(function(request) {
+              var url = new URL(request.url);
+              return url.pathname !== '/' || !url.searchParams.get('day') ||
+                dates.indexOf(url.searchParams.get('day')) !== -1;
+            }).map(function(request) { return cache.delete(request); }));
+          });
+        })
+        .then(function() {
+          return withStore(STATE, 'readwrite', function(store) { return store.put(page.cursor, 'cursor'); });
+        })
+        .then(function() { return page.more ? pull() : null; });
+    });
+}
+
+// Post a message to every open page of the app.
+function notify(message) {
+  return self.clients.matchAll({type: 'window'}).then(function(clients) {
+    clients.forEach(function(client) { client.postMessage(message); });
+  });
+}
+
+var syncing = null;
+
+// Send the queued edits in one batch, then catch up with the server when
+// there were any or the client just reconnected.
+function sync(reconnected) {
+  if (syncing) {
+    return syncing;
+  }
+  syncing = withStore(EDITS, 'readonly', function(store) { return store.getAll(); })
+    .then(function(edits) {
+      if (!edits.length) {
+        return reconnected;
+      }
+      return fetch('/api/v1/sync', {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({days: edits})
+      }).then(function(response) {
+        // keep the queue when the batch was not processed at all
+        if (!response.ok) {
+          throw new Error('Sync failed with ' + response.status);
+        }
+        return response.json();
+      }).then(function(result) {
+        var rejected = result.rejected.map(function(day) { return day.date; });
+        // saved or lost to a later edit on the server, rejected days stay
+        // queued until they are edited again
+        return withStore(EDITS, 'readwrite', function(store) {
+          edits.forEach(function(edit) {
+            if (rejected.indexOf(edit.date) !== -1) {
+              return;
+            }
+            var request = store.get(edit.date);
+            request.onsuccess = function() {
+              if (request.result && request.result.updated === edit.updated) {
+                store.delete(edit.date);
+              }
+            };
+          });
+        }).then(function() {
+          if (rejected.length) {
+            return notify({type: 'rejected', dates: rejected});
+          }
+        });
+      }).then(function() { return true; });
+    })
+    .then(function(changed) { return changed ? pull() : null; })
+    .finally(function() { syncing = null; });
+  return syncing;
+}
+
 self.addEventListener('fetch', function(event) {
+  var request = event.request;
+  var url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (request.method === 'POST' && url.pathname === '/') {
+    event.respondWith(
+      fetch(request.clone()).catch(function() {
+        return queueEdit(request).then(function() { return offlineResponse(request); });
+      })
+    );
+    return;
+  }
+
+  if (request.method !== 'GET' || url.pathname.startsWith('/api/') || url.pathname.startsWith('/export')) {
+    return;
+  }
   event.respondWith(
-    caches.match(event.request)
-      .then(function(response) {
-        // Cache hit - return response
-        if (response) {
-          return response;
-        }
-        return fetch(event.request);
+    fetch(request).then(function(response) {
+      if (response.ok) {
+        var copy = response.clone();
+        caches.open(CACHE).then(function(cache) { cache.put(request, copy); });
       }
-    )
+      event.waitUntil(sync(false).catch(function() {}));
+      return response;
+    }).catch(function() {
+      return caches.match(request).then(function(response) {
+        return response || Response.error();
+      });
+    })
   );
 });
+
+self.addEventListener('sync', function(event) {
+  if (event.tag === 'crms-sync') {
+    event.waitUntil(sync(true));
+  }
+});
+
+self.addEventListener('message', function(event) {
+  if (event.data === 'sync') {
+    event.waitUntil(sync(true).catch(function() {}));
+  }
+});
@@ -1,24 +1,41 @@
-import csv
-import json
 from datetime import date, timedelta
-from io import StringIO
 from typing import Union
 
+import structlog
 from flask import (
     Blueprint,
     Response,
+    abort,
+    get_template_attribute,
     redirect,
     render_template,
     request,
     send_file,
+    stream_with_context,
     url_for,
 )
-from flask_login import current_user, login_required, login_user, logout_user
-from werkzeug.datastructures import MultiDict
+from flask_login import current_user, login_required
+from markupsafe import Markup
 from werkzeug.security import generate_password_hash
-
+from werkzeug.wrappers import Response as BaseResponse
+
+from crms import (
+    config,
+    cycles,
+    days,
+    export,
+    export_jobs,
+    forms,
+    importer,
+    login_manager,
+    metrics,
+)
+from crms.cache import fragments
+from crms.conditional import VERSION, conditional
 from crms.forms import DayForm, LoginForm, RegistrationForm
-from crms.models import Day, DayHistory, User, db
+from crms.models import Cycle, ExportJob, User, db
+
+logger = structlog.getLogger()
 
 app = Blueprint("", __name__, template_folder="templates")
 
@@ -31,27 +48,39 @@ def get_day_date() -> date:
     )
 
 
+def render_cycles(user_cycles: list[Cycle]) -> list[Markup]:
+    """Render rows of the overview, reusing cached rows of unchanged cycles."""
+    keys = [
+        f"cycle:{VERSION}:{cycle.user_id}:{cycle.start_date}:{cycle.revision}"
+        for cycle in user_cycles
+    ]
+    rows = [fragments.get(key) for key in keys]
+    missing = [cycle for cycle, row in zip(user_cycles, rows) if row is None]
+    if missing:
+        render_cycle = get_template_attribute("cycle.j2", "render_cycle")
+        rendered = iter(cycles.cells(current_user.id, missing))
+        for i, row in enumerate(rows):
+            if row is None:
+                rows[i] = str(render_cycle(next(rendered)))
+                fragments.set(keys[i], rows[i])
+    return [Markup(row) for row in rows]
+
+
 @app.route("/", methods=["GET", "POST"])
 @login_required
+@conditional
 def index() -> str:
     day_date = get_day_date()
 
-    form = DayForm(request.form)
-
-    day = current_user.days.filter_by(date=day_date).first() or Day.default(
-        current_user.id, day_date
-    )
+    day = days.get(current_user.id, day_date)
 
     saved = False
-    if request.method == "POST" and form.validate():
-        day.from_dict(form.data)
-        day_history = DayHistory.from_day(day)
-        db.session.add(day_history)
-        db.session.add(day)
-        db.session.commit()
+    form = DayForm(request.form) if request.method == "POST" else None
+    if form is not None and form.validate():
+        day = days.save(day, form.data)
         saved = True
     else:
-        form = DayForm(MultiDict(day.to_dict()))
+        form = DayForm(data=day.to_dict())
 
     return render_template(
         "day.j2",
@@ -66,21 +95,30 @@ def index() -> str:
 
 @app.route("/overview")
 @login_required
+@conditional
 def overview() -> str:
-    days = current_user.days.order_by(Day.date).all()
-    cycles: list[list[Day]] = []
-    cur_cycle: list[Day] = []
-    for day in days:
-        if day.new_cycle:
-            if cur_cycle:
-                cycles.append(cur_cycle)
-                cur_cycle = []
-        if cur_cycle:
-            cur_cycle += [None for _ in range((day.date - cur_cycle[-1].date).days - 1)]
-        cur_cycle.append(day)
-    if cur_cycle:
-        cycles.append(cur_cycle)
-    return render_template("overview.j2", cycles=cycles, day_date=get_day_date())
+    user_cycles, older = cycles.page(current_user.id, config.OVERVIEW_CYCLES)
+    return render_template(
+        "overview.j2",
+        cycles=render_cycles(user_cycles),
+        categories=forms.category,
+        older_url=url_for("overview_cycles", before=older) if older else None,
+        day_date=get_day_date(),
+    )
+
+
+@app.route("/overview/cycles")
+@login_required
+@conditional
+def overview_cycles() -> dict:
+    before = request.args.get("before", type=date.fromisoformat)
+    if before is None:
+        abort(400)
+    user_cycles, older = cycles.page(current_user.id, config.OVERVIEW_CYCLES, before)
+    return {
+        "cycles": render_cycles(user_cycles),
+        "next": url_for("overview_cycles", before=older) if older else None,
+    }
 
 
 @app.route("/sw.js")
@@ -99,8 +137,7 @@ def login() -> Union[Response, str]:
 
     form = LoginForm(request.form)
     if request.method == "POST" and form.validate():
-        user = User.query.filter_by(name=form.username.data).first()
-        login_user(user, remember=True)
+        login_manager.login(form.user)
 
         return redirect(url_for("index"))
 
@@ -146,17 +183,18 @@ def register_post() -> Union[Response, str]:
 @app.route("/logout", methods=["GET"])
 @login_required
 def logout() -> Response:
-    logout_user()
+    login_manager.logout()
     return redirect(url_for("login"))
 
 
 @app.route("/export", methods=["GET"])
 @login_required
+@conditional
 def export_json() -> Response:
-    data = json.dumps([day.to_dict() for day in Day.query.order_by(Day.date).all()])
-
     return Response(
-        data,
+        stream_with_context(
+            metrics.count_bytes(export.iter_json(current_user.id), "json")
+        ),
         mimetype="application/json",
         headers={"Content-Disposition": "attachment;filename=crms.json"},
     )
@@ -164,15 +202,81 @@ def export_json() -> Response:
 
 @app.route("/export_csv", methods=["GET"])
 @login_required
+@conditional
 def export_csv() -> Response:
-    f = StringIO()
-    writer = csv.DictWriter(f, fieldnames=Day().to_dict().keys())
-    writer.writeheader()
-    for day in Day.query.order_by(Day.date).all():
-        writer.writerow(day.to_dict())
+    chunks = export.iter_csv(current_user.id)
+    if request.args.get("gzip"):
+        return Response(
+            stream_with_context(
+                metrics.count_bytes(export.gzip_chunks(chunks), "csv.gz")
+            ),
+            mimetype="application/gzip",
+            headers={"Content-Disposition": "attachment;filename=crms.csv.gz"},
+        )
 
     return Response(
-        f.getvalue().encode(),
+        stream_with_context(metrics.count_bytes(chunks, "csv")),
         mimetype="application/csv",
         headers={"Content-Disposition": "attachment;filename=crms.csv"},
     )
+
+
+@app.route("/export_parquet", methods=["GET"])
+@login_required
+@conditional
+def export_parquet() -> Response:
+    try:
+        chunks = export.iter_parquet(current_user.id)
+    except RuntimeError:
+        abort(501)
+    return Response(
+        stream_with_context(metrics.count_bytes(chunks, "parquet")),
+        mimetype="application/vnd.apache.parquet",
+        headers={"Content-Disposition": "attachment;filename=crms.parquet"},
+    )
+
+
+@app.route("/exports/<export_format>", methods=["GET"])
+@login_required
+def export_page(export_format: str) -> Union[str, BaseResponse]:
+    """Start a background export and show its progress until it can be
+    downloaded."""
+    if export_format not in export_jobs.FORMATS:
+        abort(404)
+    job_id = request.args.get("job", type=int)
+    job = db.session.get(ExportJob, job_id) if job_id else None
+    if job is None or job.user_id != current_user.id:
+        job = export_jobs.enqueue(current_user.id, export_format)
+        return redirect(url_for("export_page", export_format=export_format, job=job.id))
+    return render_template(
+        "export.j2",
+        job=job,
+        status=export_jobs.status(job),
+        day_date=get_day_date(),
+    )
+
+
+@app.route("/import", methods=["GET", "POST"])
+@login_required
+def import_days() -> str:
+    imported = None
+    rate = None
+    error = None
+    upload = request.files.get("file")
+    if request.method == "POST" and upload:
+        try:
+            imported, seconds = importer.run(
+                current_user.id, importer.parse(upload.stream, upload.filename)
+            )
+            rate = imported / seconds
+            logger.info("crms.import", rows=imported, rows_per_second=rate)
+        except ValueError as e:
+            error = str(e)
+
+    return render_template(
+        "import.j2",
+        imported=imported,
+        rate=rate,
+        error=error,
+        day_date=get_day_date(),
+    )
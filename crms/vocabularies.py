@@ -0,0 +1,153 @@
+"""Values of the observations, with their labels shown by the forms.
+
+The string values are stored as small integer codes, see ``CODES``. Every
+value offered by a form needs a code there, values stored without being
+offered, like the "N/A" category of a new day, have one too.
+"""
+category = {
+    "red": "Menštruácia",
+    "green": "Sucho",
+    "gray": "Hlien",
+    "lightgreen": "Sucho po vrchole",
+    "yellow": "Nekvalitný hlien",
+    "gold": "Nekvalitný potencialne plodný hlien",
+}
+menstrual = {
+    "N/A": "Žiadne",
+    "H": "H - Veľmi silná",
+    "M": "M - Stredne silná",
+    "L": "L - Slabá",
+    "VL": "VL - Veľmi slabá",
+    "B": "B - Hnedá (čierna)",
+}
+indicator = {
+    "N/A": "Žiadne",
+    "0": "0 - Sucho",
+    "2": "2 - Vlhko bez klzkosti",
+    "2W": "2W - Mokro bez klzkosti",
+    "4": "4 - Lesk be klzkosti",
+    "6": "6 - Lepkavý (do 0.5cm)",
+    "8": "8 - Ťahavý (1 - 2 cm)",
+    "10": "10 - Elastický (>2.5 cm)",
+    "10DL": "10DL - Vlhko s klzkosťou",
+    "10SL": "10SL - Lesk s klzkosťou",
+    "10WL": "10WL - Mokro s klzkosťou",
+    "?X?": "?X? - Ani srnka netuší",
+}
+color = {
+    "N/A": "Žiadne",
+    "B": "B - Hnedé alebo čierne krvácanie",
+    "C": "C - Zakalený (alebo biely)",
+    "CK": "CK - Zakalený/číry",
+    "G": "G - Gumenný (ako lepidlo)",
+    "K": "K - Číry",
+    "L": "L - Klzký",
+    "P": "P - Pastovitý (alebo krémový)",
+    "Y": "Y - Žltý (aj slabožltý)",
+}
+sensation = {
+    "N/A": "Žiadne",
+    "L": "L - Klzký",
+    "G": "G - Gumenný (ako lepidlo)",
+    "P": "P - Pastovitý (alebo krémový)",
+}
+frequency = {
+    "N/A": "Žiadne",
+    "X1": "X1 - Raz za deň",
+    "X2": "X2 - Dva krát za deň",
+    "X3": "X3 - Tri krát za deň",
+    "AD": "AD - Po celý deň",
+}
+day_count = {
+    0: 0,
+    1: 1,
+    2: 2,
+    3: 3,
+}
+
+arrow = {
+    "": "Žiadne",
+    "up": "Šípka hore",
+    "down": "Šípka dole",
+}
+
+# Observations stored as codes, with their values.
+VOCABULARIES = {
+    "category": category,
+    "menstrual": menstrual,
+    "indicator": indicator,
+    "color": color,
+    "sensation": sensation,
+    "frequency": frequency,
+    "arrow": arrow,
+}
+
+# The stored code of each value. Codes never change once released: a new value
+# gets the next unused code, a retired one keeps its code. The codes of a
+# vocabulary are dense from 0, they index the dictionaries of the Parquet export.
+CODES = {
+    "category": {
+        "N/A": 0,
+        "red": 1,
+        "green": 2,
+        "gray": 3,
+        "lightgreen": 4,
+        "yellow": 5,
+        "gold": 6,
+    },
+    "menstrual": {
+        "N/A": 0,
+        "H": 1,
+        "M": 2,
+        "L": 3,
+        "VL": 4,
+        "B": 5,
+    },
+    "indicator": {
+        "N/A": 0,
+        "0": 1,
+        "2": 2,
+        "2W": 3,
+        "4": 4,
+        "6": 5,
+        "8": 6,
+        "10": 7,
+        "10DL": 8,
+        "10SL": 9,
+        "10WL": 10,
+        "?X?": 11,
+    },
+    "color": {
+        "N/A": 0,
+        "B": 1,
+        "C": 2,
+        "CK": 3,
+        "G": 4,
+        "K": 5,
+        "L": 6,
+        "P": 7,
+        "Y": 8,
+    },
+    "sensation": {
+        "N/A": 0,
+        "L": 1,
+        "G": 2,
+        "P": 3,
+    },
+    "frequency": {
+        "N/A": 0,
+        "X1": 1,
+        "X2": 2,
+        "X3": 3,
+        "AD": 4,
+    },
+    "arrow": {
+        "": 0,
+        "up": 1,
+        "down": 2,
+    },
+}
+VALUES = {
+    name: {code: value for value, code in codes.items()}
+    for name, codes in CODES.items()
+}
@@ -6,6 +6,10 @@ export FLASK_APP="crms.app:create_app()"
 if [[ "$1" = 'api' ]]
 then
   flask db upgrade
-  set -- "gunicorn --workers 1 --bind :8080 crms.app:create_app()"
+  flask crms-backfill-cycles
+  flask crms-backfill-stamps
+  # metrics of the previous run's workers
+  rm -rf "${METRICS_DIR:-/tmp/crms-metrics}"
+  set -- "gunicorn -c python:crms.gunicorn_config crms.app:create_app()"
 fi
 exec $@
@@ -0,0 +1,145 @@
+"""empty message
+
+Revision ID: 5c1e0b7f3a94
+Revises: 0fa1cf356ccc
+Create Date: 2026-10-18 19:02:41.318206
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c1e0b7f3a94"
+down_revision = "0fa1cf356ccc"
+branch_labels = None
+depends_on = None
+
+# the columns of a day kept in its history, with their values in a new day
+COLUMNS = {
+    "category": (sa.String(length=32), "N/A"),
+    "menstrual": (sa.String(length=32), "N/A"),
+    "indicator": (sa.String(length=32), "N/A"),
+    "color": (sa.String(length=32), "N/A"),
+    "sensation": (sa.String(length=32), "N/A"),
+    "frequency": (sa.String(length=32), "N/A"),
+    "peak": (sa.Boolean(), False),
+    "day_count": (sa.Integer(), 0),
+    "arrow": (sa.String(length=32), ""),
+    "intercourse": (sa.Boolean(), False),
+    "notes": (sa.String(length=512), ""),
+    "new_cycle": (sa.Boolean(), False),
+}
+DEFAULTS = {column: default for column, (_, default) in COLUMNS.items()}
+BATCH_SIZE = 1000
+
+
+def history_table(*columns):
+    return sa.table(
+        "day_history",
+        sa.column("id", sa.Integer()),
+        sa.column("user_id", sa.Integer()),
+        sa.column("date", sa.Date()),
+        *columns,
+    )
+
+
+def user_ids(connection, history):
+    return connection.execute(sa.select(history.c.user_id).distinct()).scalars().all()
+
+
+def versions(connection, history, user_id):
+    """Yield the rows of a user's history, ordered by day and version."""
+    return connection.execute(
+        history.select()
+        .where(history.c.user_id == user_id)
+        .order_by(history.c.date, history.c.id)
+    ).mappings()
+
+
+def execute_batches(connection, statement, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(statement, rows[start : start + BATCH_SIZE])
+
+
+def upgrade():
+    with op.batch_alter_table("day_history", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("changes", sa.JSON(), nullable=True))
+
+    # keep only what every version changed, and drop versions changing nothing
+    connection = op.get_bind()
+    history = history_table(
+        sa.column("changes", sa.JSON()),
+        *(sa.column(column, type_) for column, (type_, _) in COLUMNS.items()),
+    )
+    for user_id in user_ids(connection, history):
+        updates = []
+        deleted = []
+        previous_date = None
+        for row in versions(connection, history, user_id).all():
+            if row["date"] != previous_date:
+                state = dict(DEFAULTS)
+                previous_date = row["date"]
+            changes = {
+                column: row[column]
+                for column in COLUMNS
+                if row[column] != state[column]
+            }
+            state.update(changes)
+            if changes:
+                updates.append({"_id": row["id"], "_changes": changes})
+            else:
+                deleted.append({"_id": row["id"]})
+        execute_batches(
+            connection,
+            history.update()
+            .where(history.c.id == sa.bindparam("_id"))
+            .values(changes=sa.bindparam("_changes")),
+            updates,
+        )
+        execute_batches(
+            connection,
+            history.delete().where(history.c.id == sa.bindparam("_id")),
+            deleted,
+        )
+
+    with op.batch_alter_table("day_history", schema=None) as batch_op:
+        batch_op.alter_column("changes", existing_type=sa.JSON(), nullable=False)
+        for column in COLUMNS:
+            batch_op.drop_column(column)
+
+
+def downgrade():
+    with op.batch_alter_table("day_history", schema=None) as batch_op:
+        for column, (type_, _) in COLUMNS.items():
+            batch_op.add_column(sa.Column(column, type_, nullable=True))
+
+    # rebuild the full copy of every version from the changes
+    connection = op.get_bind()
+    history = history_table(
+        sa.column("changes", sa.JSON()),
+        *(sa.column(column, type_) for column, (type_, _) in COLUMNS.items()),
+    )
+    for user_id in user_ids(connection, history):
+        updates = []
+        previous_date = None
+        for row in versions(connection, history, user_id).all():
+            if row["date"] != previous_date:
+                state = dict(DEFAULTS)
+                previous_date = row["date"]
+            state.update(row["changes"])
+            updates.append(
+                {
+                    "_id": row["id"],
+                    **{f"_{column}": state[column] for column in COLUMNS},
+                }
+            )
+        execute_batches(
+            connection,
+            history.update()
+            .where(history.c.id == sa.bindparam("_id"))
+            .values({column: sa.bindparam(f"_{column}") for column in COLUMNS}),
+            updates,
+        )
+
+    with op.batch_alter_table("day_history", schema=None) as batch_op:
+        batch_op.drop_column("changes")
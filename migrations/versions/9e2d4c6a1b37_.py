@@ -0,0 +1,117 @@
+"""empty message
+
+Revision ID: 9e2d4c6a1b37
+Revises: 5c1e0b7f3a94
+Create Date: 2026-10-18 19:08:12.640913
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9e2d4c6a1b37"
+down_revision = "5c1e0b7f3a94"
+branch_labels = None
+depends_on = None
+
+# crms.vocabularies.CODES at the time of this migration
+CODES = {
+    "category": ["N/A", "red", "green", "gray", "lightgreen", "yellow", "gold"],
+    "menstrual": ["N/A", "H", "M", "L", "VL", "B"],
+    "indicator": [
+        "N/A",
+        "0",
+        "2",
+        "2W",
+        "4",
+        "6",
+        "8",
+        "10",
+        "10DL",
+        "10SL",
+        "10WL",
+        "?X?",
+    ],
+    "color": ["N/A", "B", "C", "CK", "G", "K", "L", "P", "Y"],
+    "sensation": ["N/A", "L", "G", "P"],
+    "frequency": ["N/A", "X1", "X2", "X3", "AD"],
+    "arrow": ["", "up", "down"],
+}
+# rows of day converted by one UPDATE
+BATCH_SIZE = 10000
+
+
+def convert(source, target, mapping):
+    """Copy ``source`` columns of day to ``target`` ones through ``mapping``,
+    in batches of ids so that no statement locks the whole table."""
+    connection = op.get_bind()
+    day = sa.table(
+        "day",
+        sa.column("id", sa.Integer()),
+        *(sa.column(name) for name in CODES),
+        *(sa.column(f"{name}_code") for name in CODES),
+    )
+    last_id = connection.scalar(sa.select(sa.func.max(day.c.id))) or 0
+    values = {
+        target(name): sa.case(mapping(name), value=day.c[source(name)], else_=None)
+        for name in CODES
+    }
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        connection.execute(
+            day.update()
+            .where(day.c.id >= start, day.c.id < start + BATCH_SIZE)
+            .values(values)
+        )
+
+
+def upgrade():
+    connection = op.get_bind()
+    day = sa.table("day", *(sa.column(name) for name in CODES))
+    for name, values in CODES.items():
+        unknown = connection.scalars(
+            sa.select(day.c[name])
+            .where(day.c[name].is_not(None), day.c[name].not_in(values))
+            .distinct()
+        ).all()
+        if unknown:
+            raise ValueError(f"Values of day.{name} without a code: {unknown}")
+
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        for name in CODES:
+            batch_op.add_column(sa.Column(f"{name}_code", sa.SmallInteger()))
+
+    convert(
+        lambda name: name,
+        lambda name: f"{name}_code",
+        lambda name: {value: code for code, value in enumerate(CODES[name])},
+    )
+
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        for name in CODES:
+            batch_op.drop_column(name)
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        for name in CODES:
+            batch_op.alter_column(
+                f"{name}_code", new_column_name=name, existing_type=sa.SmallInteger()
+            )
+
+
+def downgrade():
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        for name in CODES:
+            batch_op.alter_column(
+                name, new_column_name=f"{name}_code", existing_type=sa.SmallInteger()
+            )
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        for name in CODES:
+            batch_op.add_column(sa.Column(name, sa.String(length=32)))
+
+    convert(
+        lambda name: f"{name}_code",
+        lambda name: name,
+        lambda name: dict(enumerate(CODES[name])),
+    )
+
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        for name in CODES:
+            batch_op.drop_column(f"{name}_code")
@@ -0,0 +1,40 @@
+"""empty message
+
+Revision ID: b25fa3aa2970
+Revises: b07695d58456
+Create Date: 2026-10-18 19:02:41.630874
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b25fa3aa2970"
+down_revision = "b07695d58456"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # user_id leads the index, as every query filters by user first
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        batch_op.drop_constraint("unique_date_per_user_id", type_="unique")
+        batch_op.create_unique_constraint(
+            "unique_date_per_user_id", ["user_id", "date"]
+        )
+
+    with op.batch_alter_table("day_history", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_day_history_user_id_date", ["user_id", "date"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("day_history", schema=None) as batch_op:
+        batch_op.drop_index("ix_day_history_user_id_date")
+
+    with op.batch_alter_table("day", schema=None) as batch_op:
+        batch_op.drop_constraint("unique_date_per_user_id", type_="unique")
+        batch_op.create_unique_constraint(
+            "unique_date_per_user_id", ["date", "user_id"]
+        )
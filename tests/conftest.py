@@ -0,0 +1,69 @@
+import datetime
+import os
+from typing import Any, Callable, Iterator
+
+import pytest
+
+# crms.config reads the environment when it is imported
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from flask import Flask
+from flask.testing import FlaskClient
+from sqlalchemy import update
+
+from crms import days
+from crms.app import create_app
+from crms.models import Cycle, Day, User, db
+
+
+@pytest.fixture(name="app", autouse=True)
+def fixture_app(tmp_path: os.PathLike) -> Iterator[Flask]:
+    app = create_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path}/crms.db")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(name="user")
+def fixture_user() -> User:
+    return User.create(name="user", password="", commit=True)
+
+
+@pytest.fixture(name="client")
+def fixture_client(app: Flask, user: User) -> FlaskClient:
+    token = user.issue_api_token()
+    db.session.commit()
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+    return client
+
+
+@pytest.fixture(name="browser")
+def fixture_browser(app: Flask, user: User) -> FlaskClient:
+    browser = app.test_client()
+    with browser.session_transaction() as session:
+        session["_user_id"] = str(user.id)
+    return browser
+
+
+@pytest.fixture(name="save_day")
+def fixture_save_day(user: User) -> Callable[..., None]:
+    """Return a function saving a day of the user with the given fields.
+
+    Every save is stamped with the same second, like saves in one second
+    are by the whole-second DATETIME of MySQL.
+    """
+    second = datetime.datetime(2023, 5, 2, 12, 0, 0)
+
+    def save(
+        day_date: datetime.date = datetime.date(2023, 5, 1), **fields: Any
+    ) -> None:
+        day = {**Day.default(user.id, day_date).to_dict(), **fields, "date": day_date}
+        days.save_many(user.id, [day])
+        db.session.execute(update(Day).values(updated=second))
+        db.session.execute(update(Cycle).values(updated=second))
+        db.session.commit()
+
+    return save
@@ -0,0 +1,125 @@
+"""Statements run by one request of each scenario of crms.bench.BUDGETS."""
+import datetime
+from typing import Callable, Iterator
+
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from werkzeug.test import TestResponse
+
+from crms import days
+from crms.bench import BUDGETS, form_data
+from crms.models import Day, User, db
+
+PASSWORD = "password"
+# two cycles, the second one starting on MAY_10
+MAY_1 = datetime.date(2023, 5, 1)
+MAY_5 = datetime.date(2023, 5, 5)
+MAY_10 = datetime.date(2023, 5, 10)
+NEW_DAY = datetime.date(2023, 5, 20)
+
+Send = Callable[[FlaskClient, FlaskClient], TestResponse]
+
+SCENARIOS: list[tuple[str, Send]] = [
+    ("ping", lambda browser, api: browser.get("/ping")),
+    (
+        "login",
+        lambda browser, api: browser.application.test_client().post(
+            "/login", data={"username": "user", "password": PASSWORD}
+        ),
+    ),
+    ("index", lambda browser, api: browser.get(f"/?day={MAY_5}")),
+    # a new day extends the last cycle
+    (
+        "save",
+        lambda browser, api: browser.post(f"/?day={NEW_DAY}", data=form_data(NEW_DAY)),
+    ),
+    # a new cycle in the middle of one splits it
+    (
+        "save",
+        lambda browser, api: browser.post(
+            f"/?day={MAY_5}", data={**form_data(MAY_5), "new_cycle": "y"}
+        ),
+    ),
+    # the start of a cycle no longer starting one merges it into the previous
+    (
+        "save",
+        lambda browser, api: browser.post(f"/?day={MAY_10}", data=form_data(MAY_10)),
+    ),
+    ("overview", lambda browser, api: browser.get("/overview")),
+    ("export_json", lambda browser, api: browser.get("/export")),
+    ("export_csv", lambda browser, api: browser.get("/export_csv")),
+    ("api_day", lambda browser, api: api.get(f"/api/v1/days/{MAY_5}")),
+    (
+        "api_put",
+        lambda browser, api: api.put(f"/api/v1/days/{MAY_5}", json={"notes": "x"}),
+    ),
+    (
+        "api_put",
+        lambda browser, api: api.put(
+            f"/api/v1/days/{NEW_DAY}", json=form_data(NEW_DAY)
+        ),
+    ),
+]
+
+
+@pytest.fixture(name="history", autouse=True)
+def fixture_history(user: User) -> None:
+    user.password = generate_password_hash(PASSWORD)
+    db.session.commit()
+    saved = []
+    for offset in range(15):
+        day_date = MAY_1 + datetime.timedelta(days=offset)
+        saved.append(
+            {
+                **Day.default(user.id, day_date).to_dict(),
+                "category": "red",
+                "new_cycle": day_date in (MAY_1, MAY_10),
+                "date": day_date,
+            }
+        )
+    days.save_many(user.id, saved)
+
+
+@pytest.fixture(name="statements")
+def fixture_statements() -> Iterator[list[str]]:
+    statements: list[str] = []
+
+    def count(*args: object) -> None:
+        statements.append(str(args[2]))
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", count)
+
+
+def test_every_budget_has_a_scenario() -> None:
+    assert {name for name, _ in SCENARIOS} == set(BUDGETS)
+
+
+@pytest.mark.parametrize(
+    ("name", "send"),
+    [
+        pytest.param(name, send, id=f"{name}-{i}")
+        for i, (name, send) in enumerate(SCENARIOS)
+    ],
+)
+def test_request_stays_within_its_budget(
+    name: str,
+    send: Send,
+    browser: FlaskClient,
+    client: FlaskClient,
+    statements: list[str],
+) -> None:
+    # the bench logs in before measuring, which caches the principal
+    browser.get("/overview")
+    client.get(f"/api/v1/days/{MAY_1}")
+    # requests start with an empty session, like in production
+    db.session.remove()
+    statements.clear()
+
+    response = send(browser, client)
+
+    assert response.status_code < 400
+    assert len(statements) <= BUDGETS[name], statements
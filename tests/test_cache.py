@@ -0,0 +1,24 @@
+from typing import Callable
+
+from flask.testing import FlaskClient
+
+from crms.metrics import FRAGMENT_LOOKUPS
+
+
+def lookups(result: str) -> float:
+    return FRAGMENT_LOOKUPS.values.get((result,), 0.0)
+
+
+def test_an_edit_in_the_same_second_renders_the_cycle_again(
+    browser: FlaskClient, save_day: Callable[..., None]
+) -> None:
+    save_day(category="red")
+    assert "category-red" in browser.get("/overview").text
+    hits = lookups("hit")
+    assert "category-red" in browser.get("/overview").text
+    assert lookups("hit") == hits + 1
+
+    save_day(category="green")
+    misses = lookups("miss")
+    assert "category-green" in browser.get("/overview").text
+    assert lookups("miss") == misses + 1
@@ -0,0 +1,16 @@
+from typing import Callable
+
+from flask.testing import FlaskClient
+
+
+def test_an_edit_in_the_same_second_changes_the_etag(
+    browser: FlaskClient, save_day: Callable[..., None]
+) -> None:
+    save_day(notes="first")
+    etag = browser.get("/overview").headers["ETag"]
+    assert browser.get("/overview", headers={"If-None-Match": etag}).status_code == 304
+
+    save_day(notes="second")
+    response = browser.get("/overview", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,160 @@
+"""Cycles maintained incrementally as days are saved."""
+import datetime
+from typing import Callable
+
+import pytest
+from sqlalchemy import select
+
+from crms import cycles, days
+from crms.models import Cycle, Day, User, db
+
+MAY_1 = datetime.date(2023, 5, 1)
+SaveDay = Callable[..., None]
+
+
+def may(day: int) -> datetime.date:
+    return MAY_1.replace(day=day)
+
+
+def stored(user: User) -> list[tuple]:
+    return [
+        (cycle.start_date, cycle.end_date, cycle.length, cycle.peak_date)
+        for cycle in db.session.scalars(
+            select(Cycle).where(Cycle.user_id == user.id).order_by(Cycle.start_date)
+        ).all()
+    ]
+
+
+def rebuilt(user: User) -> list[tuple]:
+    """The cycles of all days of the user, built from scratch."""
+    rows = db.session.execute(
+        select(Day.date, Day.new_cycle, Day.peak)
+        .where(Day.user_id == user.id)
+        .order_by(Day.date)
+    ).all()
+    return [
+        (cycle.start_date, cycle.end_date, cycle.length, cycle.peak_date)
+        for cycle in cycles.build(user.id, rows)
+    ]
+
+
+def revisions(user: User) -> dict[datetime.date, int]:
+    rows = db.session.execute(
+        select(Cycle.start_date, Cycle.revision).where(Cycle.user_id == user.id)
+    )
+    return {row.start_date: row.revision for row in rows}
+
+
+@pytest.fixture(name="three_cycles", autouse=True)
+def fixture_three_cycles(user: User, save_day: SaveDay) -> None:
+    """Cycles starting on May 1, 6 and 11, with no day saved on May 8."""
+    for day in range(1, 15):
+        if day != 8:
+            save_day(may(day), category="red", new_cycle=day in (1, 6, 11))
+    assert [cycle[0] for cycle in stored(user)] == [may(1), may(6), may(11)]
+
+
+def test_new_cycle_in_the_middle_splits_a_cycle(user: User, save_day: SaveDay) -> None:
+    save_day(may(3), category="red", new_cycle=True)
+
+    assert stored(user) == rebuilt(user)
+    assert [cycle[0] for cycle in stored(user)] == [may(1), may(3), may(6), may(11)]
+
+
+def test_cleared_start_merges_into_the_previous_cycle(
+    user: User, save_day: SaveDay
+) -> None:
+    save_day(may(6), category="red", new_cycle=False)
+
+    assert stored(user) == rebuilt(user)
+    assert stored(user)[0] == (may(1), may(10), 10, None)
+
+
+def test_cleared_start_of_the_last_cycle_merges_it(
+    user: User, save_day: SaveDay
+) -> None:
+    save_day(may(11), category="red", new_cycle=False)
+
+    assert stored(user) == rebuilt(user)
+    assert stored(user)[-1] == (may(6), may(14), 9, None)
+
+
+def test_day_in_a_gap_extends_nothing_but_its_cycle(
+    user: User, save_day: SaveDay
+) -> None:
+    before = revisions(user)
+
+    save_day(may(8), category="red", peak=True)
+
+    assert stored(user) == rebuilt(user)
+    assert stored(user)[1] == (may(6), may(10), 5, may(8))
+    after = revisions(user)
+    assert after[may(6)] > before[may(6)]
+    # renders of the other cycles stay cached
+    assert after[may(1)] == before[may(1)]
+    assert after[may(11)] == before[may(11)]
+
+
+def test_last_day_of_a_cycle_moves_its_peak(user: User, save_day: SaveDay) -> None:
+    save_day(may(10), category="red", peak=True)
+
+    assert stored(user) == rebuilt(user)
+    assert stored(user)[1] == (may(6), may(10), 5, may(10))
+
+
+def test_day_before_the_first_cycle_starts_a_cycle(
+    user: User, save_day: SaveDay
+) -> None:
+    save_day(datetime.date(2023, 4, 28), category="red")
+
+    assert stored(user) == rebuilt(user)
+    assert stored(user)[:2] == [
+        (datetime.date(2023, 4, 28), datetime.date(2023, 4, 28), 1, None),
+        (may(1), may(5), 5, None),
+    ]
+
+
+def test_day_before_an_unflagged_first_cycle_joins_it(
+    user: User, save_day: SaveDay
+) -> None:
+    save_day(may(1), category="red", new_cycle=False)
+
+    save_day(datetime.date(2023, 4, 28), category="red")
+
+    assert stored(user) == rebuilt(user)
+    assert stored(user)[0] == (datetime.date(2023, 4, 28), may(5), 8, None)
+
+
+def test_day_after_the_last_cycle_extends_it(user: User, save_day: SaveDay) -> None:
+    save_day(may(20), category="red")
+
+    assert stored(user) == rebuilt(user)
+    assert stored(user)[-1] == (may(11), may(20), 10, None)
+
+
+def test_batch_over_several_cycles_is_refreshed_at_once(user: User) -> None:
+    batch = [
+        {**Day.default(user.id, day).to_dict(), "date": day, **fields}
+        for day, fields in [
+            (may(2), {"category": "red", "new_cycle": True}),
+            (may(6), {"category": "red", "new_cycle": False}),
+            (may(12), {"category": "red", "peak": True}),
+        ]
+    ]
+
+    days.save_many(user.id, batch)
+
+    assert stored(user) == rebuilt(user)
+    assert [cycle[0] for cycle in stored(user)] == [may(1), may(2), may(11)]
+
+
+def test_saved_form_splits_and_merges_cycles(user: User) -> None:
+    day = days.get(user.id, may(3))
+    days.save(day, {**day.to_dict(), "new_cycle": True})
+    assert [cycle[0] for cycle in stored(user)] == [may(1), may(3), may(6), may(11)]
+
+    day = days.get(user.id, may(3))
+    days.save(day, {**day.to_dict(), "new_cycle": False})
+
+    assert stored(user) == rebuilt(user)
+    assert [cycle[0] for cycle in stored(user)] == [may(1), may(6), may(11)]
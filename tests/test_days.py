@@ -0,0 +1,129 @@
+import datetime
+from typing import Sequence
+
+from sqlalchemy import select
+
+from crms import days
+from crms.models import Day, DayHistory, User, db
+
+MAY_1 = datetime.date(2023, 5, 1)
+
+
+def form(**fields: object) -> dict:
+    """Return form data of a day, the default one changed by ``fields``."""
+    return {**Day.default(0, MAY_1).to_dict(), **fields}
+
+
+def history_count() -> int:
+    return db.session.scalar(select(db.func.count()).select_from(DayHistory))
+
+
+def test_versions_are_rebuilt_from_the_changes(user: User) -> None:
+    saved = [
+        form(notes="first"),
+        form(notes="first", category="red", peak=True),
+        form(notes="", category="red", peak=True, day_count="2"),
+    ]
+    for data in saved:
+        days.save(days.get(user.id, MAY_1), data)
+
+    versions = days.versions(user.id, MAY_1)
+
+    assert [version["version"] for version in versions] == [1, 2, 3]
+    assert [version["day"] for version in versions] == [
+        {**days.snapshot(data), "date": MAY_1.isoformat()} for data in saved
+    ]
+    # only the changed fields are stored
+    assert [version["changes"] for version in versions] == [
+        {"notes": "first"},
+        {"category": "red", "peak": True},
+        {"notes": "", "day_count": 2},
+    ]
+    assert days.snapshot(days.get(user.id, MAY_1)) == days.snapshot(saved[-1])
+
+
+def test_the_first_save_records_what_differs_from_the_default(user: User) -> None:
+    days.save(days.get(user.id, MAY_1), form(category="green"))
+
+    (version,) = days.versions(user.id, MAY_1)
+    assert version["changes"] == {"category": "green"}
+    assert version["day"] == {
+        **days.DEFAULTS,
+        "category": "green",
+        "date": MAY_1.isoformat(),
+    }
+
+
+def test_the_first_save_of_a_default_day_records_no_change(user: User) -> None:
+    days.save(days.get(user.id, MAY_1), form())
+
+    assert days.get(user.id, MAY_1).id is not None
+    assert days.versions(user.id, MAY_1) == []
+
+
+def test_saves_changing_nothing_record_no_version(user: User) -> None:
+    days.save(days.get(user.id, MAY_1), form(notes="same"))
+    days.save(days.get(user.id, MAY_1), form(notes="same"))
+    days.save_many(user.id, [{**form(notes="same"), "date": MAY_1}])
+
+    assert history_count() == 1
+    assert len(days.versions(user.id, MAY_1)) == 1
+
+
+def test_diff_compares_the_stored_types() -> None:
+    # day_count comes from a form as a string
+    before = days.snapshot(form(day_count=2))
+    assert days.diff(before, days.snapshot(form(day_count="2"))) == {}
+    assert days.diff(before, days.snapshot(form(day_count="3"))) == {"day_count": 3}
+
+
+def stored_days(user: User) -> Sequence[Day]:
+    db.session.expire_all()
+    return db.session.scalars(select(Day).where(Day.user_id == user.id)).all()
+
+
+def test_save_many_inserts_then_updates_the_same_date(user: User) -> None:
+    days.save_many(user.id, [{**form(category="red"), "date": MAY_1}])
+    (inserted,) = stored_days(user)
+    inserted_id, created, revision = inserted.id, inserted.created, inserted.revision
+
+    days.save_many(user.id, [{**form(category="gray", peak=True), "date": MAY_1}])
+
+    (updated,) = stored_days(user)
+    assert updated.id == inserted_id
+    assert updated.created == created
+    assert updated.revision > revision
+    assert (updated.category, updated.peak) == ("gray", True)
+    assert updated.stamp == Day.stamps(updated.to_dict())["stamp"]
+    assert history_count() == 2
+
+
+def test_save_many_upserts_new_and_stored_days_at_once(user: User) -> None:
+    may_2 = datetime.date(2023, 5, 2)
+    days.save_many(user.id, [{**form(category="red"), "date": MAY_1}])
+
+    days.save_many(
+        user.id,
+        [
+            {**form(category="green"), "date": MAY_1},
+            {**form(category="gray"), "date": may_2},
+            # later items win over earlier ones with the same date
+            {**form(category="yellow"), "date": may_2},
+        ],
+    )
+
+    saved = {day.date: day.category for day in stored_days(user)}
+    assert saved == {MAY_1: "green", may_2: "yellow"}
+
+
+def test_save_of_a_day_inserted_meanwhile_updates_it(user: User) -> None:
+    # both requests read the day before either saved it
+    first, second = Day.default(user.id, MAY_1), Day.default(user.id, MAY_1)
+    inserted = days.save(first, form(category="red"))
+
+    updated = days.save(second, form(category="gray"))
+
+    assert updated.id == inserted.id
+    assert [(day.id, day.category) for day in stored_days(user)] == [
+        (inserted.id, "gray")
+    ]
@@ -0,0 +1,20 @@
+from typing import Callable
+
+import pytest
+
+from crms import export_jobs
+from crms.models import ExportJob, User, db
+
+
+def test_an_export_is_reused_until_the_days_change(
+    user: User, save_day: Callable[..., None], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # jobs stay queued, so they are reusable
+    monkeypatch.setattr(export_jobs, "_submit", lambda job_id: None)
+    save_day(notes="first")
+    job = export_jobs.enqueue(user.id, "csv")
+    assert export_jobs.enqueue(user.id, "csv").id == job.id
+
+    save_day(notes="second")
+    assert export_jobs.enqueue(user.id, "csv").id != job.id
+    assert db.session.query(ExportJob).count() == 2
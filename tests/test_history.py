@@ -0,0 +1,101 @@
+import datetime
+from pathlib import Path
+from typing import Callable, Sequence
+
+from sqlalchemy import Row, select, update
+
+from crms import days, history
+from crms.models import DayHistory, User, db
+
+MAY_1 = datetime.date(2023, 5, 1)
+# when each of the saves below was made, two per month
+EDITED = [
+    datetime.datetime(2023, 1, 1),
+    datetime.datetime(2023, 1, 15),
+    datetime.datetime(2023, 2, 3),
+    datetime.datetime(2023, 2, 20),
+]
+
+
+def saved_history(user: User, save_day: Callable[..., None]) -> list[dict]:
+    """Save four versions of a day at EDITED, returning them."""
+    save_day(MAY_1, notes="a")
+    save_day(MAY_1, notes="b")
+    save_day(MAY_1, notes="b", category="red")
+    save_day(MAY_1, notes="", category="green")
+    ids = db.session.scalars(select(DayHistory.id).order_by(DayHistory.id)).all()
+    for change_id, edited in zip(ids, EDITED):
+        db.session.execute(
+            update(DayHistory)
+            .where(DayHistory.id == change_id)
+            .values(created=edited, updated=edited)
+        )
+    db.session.commit()
+    return versions(user)
+
+
+def versions(user: User, day_date: datetime.date = MAY_1) -> list[dict]:
+    return [version["day"] for version in days.versions(user.id, day_date)]
+
+
+def stored() -> Sequence[Row]:
+    return db.session.execute(
+        select(
+            DayHistory.id,
+            DayHistory.date,
+            DayHistory.changes,
+            DayHistory.created,
+            DayHistory.updated,
+        ).order_by(DayHistory.id)
+    ).all()
+
+
+def test_compaction_keeps_the_last_version_of_each_period(
+    user: User, save_day: Callable[..., None]
+) -> None:
+    before = saved_history(user, save_day)
+
+    removed = history.compact(user.id, datetime.datetime(2023, 3, 1), "month")
+
+    assert removed == 2
+    assert versions(user) == [before[1], before[3]]
+    assert [row.updated for row in stored()] == [EDITED[1], EDITED[3]]
+
+
+def test_compaction_leaves_changes_after_the_cutoff(
+    user: User, save_day: Callable[..., None]
+) -> None:
+    before = saved_history(user, save_day)
+
+    history.compact(user.id, datetime.datetime(2023, 2, 10), "month")
+
+    assert versions(user) == before[1:]
+
+
+def test_compaction_in_batches_keeps_every_day(
+    user: User, save_day: Callable[..., None]
+) -> None:
+    before = saved_history(user, save_day)
+    next_day = MAY_1 + datetime.timedelta(days=1)
+    save_day(next_day, notes="next")
+
+    history.compact(user.id, datetime.datetime(2024, 1, 1), "month", batch_size=1)
+
+    assert versions(user) == [before[1], before[3]]
+    assert [version["notes"] for version in versions(user, next_day)] == ["next"]
+
+
+def test_archive_and_restore_give_back_the_original_rows(
+    user: User, save_day: Callable[..., None], tmp_path: Path
+) -> None:
+    before = saved_history(user, save_day)
+    rows = stored()
+
+    assert history.archive(user.id, datetime.datetime(2023, 3, 1), str(tmp_path)) == 4
+    assert len(stored()) == 1
+    assert versions(user) == [before[-1]]
+
+    assert history.restore(user.id, str(tmp_path)) == 4
+    assert stored() == rows
+    assert versions(user) == before
+    assert not history.archive_path(str(tmp_path), user.id).exists()
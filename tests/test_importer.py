@@ -0,0 +1,155 @@
+"""Import of the JSON and CSV exports."""
+import datetime
+import gzip
+import io
+import json
+from typing import Callable
+
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import select
+
+from crms import export, importer
+from crms.models import Day, User, db
+
+MAY_1 = datetime.date(2023, 5, 1)
+
+
+@pytest.fixture(name="other")
+def fixture_other() -> User:
+    return User.create(name="other", password="", commit=True)
+
+
+@pytest.fixture(name="exported", autouse=True)
+def fixture_exported(save_day: Callable[..., None]) -> None:
+    save_day(MAY_1, category="red", menstrual="M", new_cycle=True, notes="žena")
+    save_day(MAY_1 + datetime.timedelta(days=1), category="green", day_count=2)
+    save_day(MAY_1 + datetime.timedelta(days=2), category="gray", peak=True)
+
+
+def without_ids(user_id: int) -> list[dict]:
+    return [
+        {k: v for k, v in day.items() if k != "id"}
+        for day in json.loads("".join(export.iter_json(user_id)))
+    ]
+
+
+def stored_dates(user_id: int) -> list[datetime.date]:
+    return list(
+        db.session.scalars(
+            select(Day.date).where(Day.user_id == user_id).order_by(Day.date)
+        )
+    )
+
+
+def item(day_date: datetime.date, **fields: object) -> dict:
+    return {"date": day_date.isoformat(), "category": "red", **fields}
+
+
+def test_json_is_parsed_across_chunks(user: User) -> None:
+    data = "".join(export.iter_json(user.id)).encode()
+
+    # a chunk boundary falls inside objects and inside the two bytes of "ž"
+    parsed = list(importer.iter_json(io.BytesIO(data), chunk_size=3))
+
+    assert parsed == json.loads(data)
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [(b'{"date": "2023-05-01"}', "Expected a JSON array"), (b'[{"date": 1},', "end")],
+)
+def test_json_that_is_not_an_array_is_refused(data: bytes, message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        list(importer.iter_json(io.BytesIO(data), chunk_size=4))
+
+
+@pytest.mark.parametrize(
+    ("filename", "encode"),
+    [
+        ("crms.json", lambda user_id: "".join(export.iter_json(user_id)).encode()),
+        ("crms.csv", lambda user_id: b"".join(export.iter_csv(user_id))),
+        (
+            "crms.csv.gz",
+            lambda user_id: b"".join(export.gzip_chunks(export.iter_csv(user_id))),
+        ),
+    ],
+)
+def test_export_is_imported_unchanged(
+    user: User,
+    other: User,
+    filename: str,
+    encode: Callable[[int], bytes],
+) -> None:
+    stream = io.BytesIO(encode(user.id))
+
+    count, _ = importer.run(other.id, importer.parse(stream, filename))
+
+    assert count == 3
+    assert without_ids(other.id) == without_ids(user.id)
+
+
+def test_corrupt_gzip_is_refused(other: User) -> None:
+    data = gzip.compress(b"date,category\n2023-05-01,red\n")[:-10]
+
+    with pytest.raises(ValueError, match="cannot be read"):
+        importer.run(other.id, importer.parse(io.BytesIO(data), "crms.csv.gz"))
+
+
+def test_unknown_format_is_refused() -> None:
+    with pytest.raises(ValueError, match="Only .json"):
+        importer.parse(io.BytesIO(b""), "crms.xml")
+
+
+def test_missing_values_take_the_defaults(other: User) -> None:
+    defaults = Day.default(other.id, None).to_dict()
+
+    data = importer.clean(1, item(MAY_1, menstrual="", day_count="3"), defaults)
+
+    assert data["menstrual"] == defaults["menstrual"]
+    assert data["indicator"] == defaults["indicator"]
+    assert data["day_count"] == 3
+    assert data["peak"] is False
+
+
+@pytest.mark.parametrize(
+    ("fields", "message"),
+    [
+        ({"category": "purple"}, "Row 1: invalid category 'purple'"),
+        ({"day_count": "7"}, "Row 1: invalid day_count 7"),
+        ({"day_count": "x"}, "Row 1: invalid day_count 'x'"),
+        ({"date": "2023-13-01"}, "Row 1: invalid date '2023-13-01'"),
+        ({"notes": "x" * 1000}, "Row 1: notes are too long"),
+    ],
+)
+def test_invalid_choice_is_refused(other: User, fields: dict, message: str) -> None:
+    defaults = Day.default(other.id, None).to_dict()
+
+    with pytest.raises(importer.InvalidRow, match=message):
+        importer.clean(1, item(MAY_1, **fields), defaults)
+
+
+def test_batches_before_an_invalid_row_stay_imported(other: User) -> None:
+    items = [item(MAY_1 + datetime.timedelta(days=offset)) for offset in range(5)]
+    items[3]["category"] = "purple"
+
+    with pytest.raises(importer.ImportFailed) as failed:
+        importer.run(other.id, iter(items), batch_size=2)
+
+    assert failed.value.imported == 2
+    assert "Row 4: invalid category 'purple'" in str(failed.value)
+    assert "2 days before it were imported" in str(failed.value)
+    db.session.rollback()
+    assert stored_dates(other.id) == [MAY_1, MAY_1 + datetime.timedelta(days=1)]
+
+
+def test_upload_reports_the_imported_days(browser: FlaskClient) -> None:
+    size = importer.BATCH_SIZE
+    items = [item(MAY_1 + datetime.timedelta(days=offset)) for offset in range(size)]
+    items.append(item(MAY_1, category="purple"))
+    upload = (io.BytesIO(json.dumps(items).encode()), "crms.json")
+
+    response = browser.post("/import", data={"file": upload})
+
+    assert f"Row {size + 1}: invalid category" in response.text
+    assert f"({size} days before it were imported)" in response.text
@@ -0,0 +1,117 @@
+"""Cached principals of the logged in users."""
+import dataclasses
+
+import pytest
+from flask import Flask, g
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from crms import login_manager
+from crms.models import User, db
+
+PASSWORD = "password"
+
+
+@pytest.fixture(name="principals", autouse=True)
+def fixture_principals(monkeypatch: pytest.MonkeyPatch) -> login_manager.Principals:
+    principals = login_manager.Principals(max_size=10, ttl=3600)
+    monkeypatch.setattr(login_manager, "principals", principals)
+    return principals
+
+
+@pytest.fixture(name="logged_in")
+def fixture_logged_in(app: Flask, user: User) -> FlaskClient:
+    user.password = generate_password_hash(PASSWORD)
+    db.session.commit()
+    client = app.test_client()
+    response = client.post("/login", data={"username": "user", "password": PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+def change_password(user: User) -> None:
+    user.password = generate_password_hash("changed")
+    db.session.commit()
+
+
+def get(client: FlaskClient, path: str) -> int:
+    """Return the status of a request loading its user afresh."""
+    # requests of the tests share the app context, and flask-login keeps the
+    # user of the last one in it
+    g.pop("_login_user", None)
+    return client.get(path).status_code
+
+
+def test_cached_principal_loads_the_user_without_a_query(
+    logged_in: FlaskClient,
+) -> None:
+    statements = []
+
+    def count(*args: object) -> None:
+        statements.append(args[2])
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        status = get(logged_in, "/import")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    assert status == 200
+    assert not statements, statements
+
+
+def test_password_change_drops_the_principal(
+    logged_in: FlaskClient, user: User, principals: login_manager.Principals
+) -> None:
+    assert principals.get(user.id) is not None
+
+    change_password(user)
+
+    assert principals.get(user.id) is None
+    assert get(logged_in, "/import") == 302
+
+
+def test_api_token_change_drops_the_principal(
+    logged_in: FlaskClient, user: User, principals: login_manager.Principals
+) -> None:
+    user.issue_api_token()
+    db.session.commit()
+
+    assert principals.get(user.id) is None
+    # the password did not change, the session stays logged in
+    assert get(logged_in, "/import") == 200
+
+
+@pytest.mark.usefixtures("logged_in")
+def test_other_changes_keep_the_principal(
+    user: User, principals: login_manager.Principals
+) -> None:
+    user.revision += 1
+    db.session.commit()
+
+    assert principals.get(user.id) is not None
+
+
+def test_session_of_an_old_password_is_logged_out(
+    logged_in: FlaskClient, user: User
+) -> None:
+    change_password(user)
+    # another worker loaded the user after the change
+    login_manager._fetch(user.id)  # pylint:disable=protected-access
+
+    assert get(logged_in, "/import") == 302
+
+
+def test_stale_principal_is_reloaded_for_a_new_password(
+    app: Flask, user: User, principals: login_manager.Principals
+) -> None:
+    stale = login_manager._cache(user)  # pylint:disable=protected-access
+    change_password(user)
+    client = app.test_client()
+    client.post("/login", data={"username": "user", "password": "changed"})
+    # a worker that did not see the change still has the old principal
+    principals.set(dataclasses.replace(stale, name="stale"))
+
+    assert get(client, "/import") == 200
+    assert principals.get(user.id).name == "user"
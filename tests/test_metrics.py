@@ -0,0 +1,35 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from crms import config, metrics
+
+
+def test_concurrent_flushes_write_one_complete_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    directory = tmp_path / "metrics"
+    monkeypatch.setattr(config, "METRICS_DIR", str(directory))
+    metrics.REQUESTS.inc(endpoint="test", method="GET", status="200")
+    errors = []
+
+    def flush() -> None:
+        try:
+            for _ in range(50):
+                metrics.flush()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=flush) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert [path.name for path in directory.iterdir()] == [f"{os.getpid()}.json"]
+    stored = json.loads((directory / f"{os.getpid()}.json").read_text())
+    assert metrics.REQUESTS.name in stored
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+from flask import Flask
+
+from crms.profiler import ProfilerMiddleware
+
+
+def test_only_the_latest_profiles_are_kept(app: Flask, tmp_path: Path) -> None:
+    app.wsgi_app = ProfilerMiddleware(  # type: ignore[assignment]
+        app.wsgi_app, str(tmp_path / "profiles"), sample_rate=1.0, max_files=2
+    )
+    client = app.test_client()
+    for _ in range(3):
+        client.get("/ping")
+
+    profiles = sorted((tmp_path / "profiles").glob("*.prof"))
+    assert len(profiles) == 2
@@ -0,0 +1,14 @@
+import pytest
+from sqlalchemy.sql import Select
+
+from crms.models import db
+from crms.query_plans import explain, queries
+
+
+@pytest.mark.parametrize(
+    "query", [pytest.param(query, id=name) for name, query in queries()]
+)
+def test_query_is_served_by_an_index(query: Select) -> None:
+    with db.engine.connect() as connection:
+        plan, full_scan = explain(connection, query)
+    assert not full_scan, plan
@@ -0,0 +1,75 @@
+"""Backfill of the stamps stored with days."""
+import datetime
+from typing import Any, Callable
+
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import select, update
+
+from crms import cache, stamps
+from crms.models import Cycle, Day, User, db
+
+MAY_1 = datetime.date(2023, 5, 1)
+MAY_2 = datetime.date(2023, 5, 2)
+
+
+@pytest.fixture(name="fragments", autouse=True)
+def fixture_fragments(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cache.fragments, "backend", cache.MemoryBackend(1 << 20))
+
+
+@pytest.fixture(name="saved", autouse=True)
+def fixture_saved(save_day: Callable[..., None]) -> None:
+    save_day(MAY_1, category="red", menstrual="M", new_cycle=True)
+    save_day(MAY_2, category="gray", indicator="10", color="K", peak=True)
+
+
+def forget_stamps() -> None:
+    db.session.execute(
+        update(Day).values(stamp=None, peak_label=None, updated=Day.updated)
+    )
+    db.session.commit()
+
+
+def stored(column: Any) -> list:
+    return list(db.session.scalars(select(column).order_by(Day.date)))
+
+
+def test_missing_stamps_are_shown_empty(browser: FlaskClient) -> None:
+    forget_stamps()
+
+    response = browser.get("/overview")
+
+    assert response.status_code == 200
+    assert "None" not in response.text
+
+
+def test_backfill_stores_the_stamps() -> None:
+    expected = stored(Day.stamp), stored(Day.peak_label)
+    updated = stored(Day.updated)
+    forget_stamps()
+
+    assert stamps.refresh(only_missing=True) == 2
+
+    assert (stored(Day.stamp), stored(Day.peak_label)) == expected
+    assert stored(Day.updated) == updated
+    assert stamps.refresh(only_missing=False) == 0
+
+
+def test_backfill_bumps_the_revisions(user: User, browser: FlaskClient) -> None:
+    expected = stored(Day.stamp)
+    forget_stamps()
+    before = browser.get("/overview")
+    revision = db.session.scalar(select(User.revision).where(User.id == user.id))
+
+    stamps.refresh(only_missing=True)
+
+    db.session.expire_all()
+    assert user.revision == revision + 1
+    assert stored(Day.revision) == [revision + 1] * 2
+    assert db.session.scalar(select(Cycle.revision)) == revision + 1
+    # the cached row of the cycle is rendered again
+    after = browser.get("/overview")
+    cells = [f"<div>{stamp}</div>" for stamp in expected]
+    assert not any(cell in before.text for cell in cells)
+    assert all(cell in after.text for cell in cells)
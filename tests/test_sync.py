@@ -0,0 +1,70 @@
+import datetime
+from typing import Callable
+
+from flask.testing import FlaskClient
+from sqlalchemy import select
+
+from crms.models import Day, User, db
+
+MAY_1 = datetime.date(2023, 5, 1)
+MAY_2 = datetime.date(2023, 5, 2)
+
+
+def pull(client: FlaskClient, cursor: str) -> dict:
+    response = client.get("/api/v1/sync", query_string={"cursor": cursor})
+    assert response.status_code == 200
+    return response.json
+
+
+def test_sync_returns_a_day_saved_in_the_second_of_the_cursor(
+    client: FlaskClient, save_day: Callable[..., None]
+) -> None:
+    save_day(MAY_1)
+    save_day(MAY_2)
+    cursor = pull(client, "")["cursor"]
+
+    # MAY_1 has the lower id than the day the cursor points at
+    save_day(MAY_1, notes="edited")
+
+    page = pull(client, cursor)
+    assert [day["notes"] for day in page["days"]] == ["edited"]
+    assert pull(client, page["cursor"])["days"] == []
+
+
+def test_sync_from_head_returns_only_later_changes(
+    client: FlaskClient, save_day: Callable[..., None]
+) -> None:
+    save_day(MAY_1)
+    head = pull(client, "head")
+    assert head["days"] == []
+
+    save_day(MAY_2)
+    assert [day["date"] for day in pull(client, head["cursor"])["days"]] == [
+        MAY_2.isoformat()
+    ]
+
+
+def test_sync_rejects_a_malformed_cursor(client: FlaskClient) -> None:
+    response = client.get("/api/v1/sync", query_string={"cursor": "2023-05-02_1"})
+    assert response.status_code == 400
+
+
+def test_sync_saves_the_valid_days_of_a_batch(client: FlaskClient, user: User) -> None:
+    edited = "2023-05-02T12:00:00+00:00"
+    response = client.post(
+        "/api/v1/sync",
+        json={
+            "days": [
+                {"date": "2023-05-01", "category": "red", "updated": edited},
+                {"date": "2023-05-02", "category": "bogus", "updated": edited},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json["saved"] == 1
+    assert [(day["index"], day["date"]) for day in response.json["rejected"]] == [
+        (1, "2023-05-02")
+    ]
+    stored = db.session.scalars(select(Day.date).where(Day.user_id == user.id))
+    assert stored.all() == [MAY_1]
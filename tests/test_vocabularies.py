@@ -0,0 +1,100 @@
+"""Stored codes of the observations."""
+import datetime
+import importlib.util
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import StatementError
+
+from crms import export
+from crms.models import Day, User, db
+from crms.vocabularies import CODES, VALUES, VOCABULARIES
+
+MIGRATION = Path(__file__).parent.parent / "migrations/versions/9e2d4c6a1b37_.py"
+
+
+def migrated_codes() -> dict[str, list[str]]:
+    """The values of each vocabulary converted by the migration, by code."""
+    spec = importlib.util.spec_from_file_location("migration", MIGRATION)
+    assert spec is not None and spec.loader is not None
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration.CODES
+
+
+def test_codes_of_the_migration_are_kept() -> None:
+    for name, values in migrated_codes().items():
+        assert {value: CODES[name][value] for value in values} == {
+            value: code for code, value in enumerate(values)
+        }
+
+
+def test_every_value_of_a_form_has_a_code() -> None:
+    assert set(CODES) == set(VOCABULARIES)
+    for name, labels in VOCABULARIES.items():
+        assert set(labels) <= set(CODES[name])
+
+
+def test_codes_are_dense() -> None:
+    for name, codes in CODES.items():
+        assert sorted(codes.values()) == list(range(len(codes)))
+        assert len(VALUES[name]) == len(codes)
+
+
+@pytest.mark.parametrize("name", list(CODES))
+def test_every_value_survives_a_round_trip(user: User, name: str) -> None:
+    first = datetime.date(2023, 5, 1)
+    for offset, value in enumerate(CODES[name]):
+        day = Day.default(user.id, first + datetime.timedelta(days=offset))
+        setattr(day, name, value)
+        db.session.add(day)
+    db.session.commit()
+    db.session.expunge_all()
+
+    column = getattr(Day, name)
+    stored = db.session.scalars(select(column).order_by(Day.date)).all()
+    codes = db.session.scalars(
+        select(db.cast(column, db.SmallInteger)).order_by(Day.date)
+    ).all()
+
+    assert stored == list(CODES[name])
+    assert codes == list(CODES[name].values())
+
+
+def test_new_day_is_stored_with_the_extra_category(user: User) -> None:
+    db.session.add(Day.default(user.id, datetime.date(2023, 5, 1)))
+    db.session.commit()
+    db.session.expunge_all()
+
+    day = db.session.scalars(select(Day)).one()
+
+    assert day.category == "N/A"
+    assert db.session.scalar(select(db.cast(Day.category, db.SmallInteger))) == 0
+
+
+def test_unknown_value_is_refused(user: User) -> None:
+    day = Day.default(user.id, datetime.date(2023, 5, 1))
+    day.category = "purple"
+    db.session.add(day)
+
+    with pytest.raises(StatementError, match="Invalid category 'purple'"):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_parquet_export_decodes_the_codes(user: User) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pytest.importorskip("pyarrow.parquet")
+    first = datetime.date(2023, 5, 1)
+    for offset, value in enumerate(CODES["indicator"]):
+        day = Day.default(user.id, first + datetime.timedelta(days=offset))
+        day.indicator = value
+        db.session.add(day)
+    db.session.commit()
+
+    data = b"".join(export.iter_parquet(user.id))
+
+    table = pa.parquet.read_table(pa.BufferReader(data))
+    assert table.column("indicator").to_pylist() == list(CODES["indicator"])
+    assert table.column("category").to_pylist() == ["N/A"] * len(CODES["indicator"])